@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BenchCompanyInfo.py
+Description: Micro-benchmarks for the hot paths of FetchCompanyInfo.py.
+             Each subcommand compares the previous implementation ("before")
+             with the current one ("after") on the same input and checks that
+             both produce the same result.
+
+Usage:
+  python skills/skill-goodinfo-fetch/kernel/BenchCompanyInfo.py parse [--pages DIR] [--cache PATH] [--repeat N]
+  python skills/skill-goodinfo-fetch/kernel/BenchCompanyInfo.py isin [--page FILE] [--rows N] [--repeat N]
+  python skills/skill-goodinfo-fetch/kernel/BenchCompanyInfo.py assemble [--sizes N N ...] [--repeat N]
+  python skills/skill-goodinfo-fetch/kernel/BenchCompanyInfo.py concepts [--rows N] [--csv FILE] [--repeat N]
+  python skills/skill-goodinfo-fetch/kernel/BenchCompanyInfo.py llm [--sizes N N ...] [--keys N] [--latency SEC] [--overload-rate P] ...
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import re
+import resource
+import sqlite3
+import statistics
+import sys
+import time
+import zlib
+from io import StringIO
+
+import pandas as pd
+
+import FetchCompanyInfo as fci
+import llm_standin
+
+
+def _timeit(func, arg, repeat):
+    """Returns per-call timings in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(arg)
+        timings.append((time.perf_counter() - t0) * 1000)
+    return timings
+
+
+def _report(label, timings):
+    print(f"  {label:<8} mean {statistics.mean(timings):8.3f} ms   "
+          f"median {statistics.median(timings):8.3f} ms   max {max(timings):8.3f} ms")
+
+
+# === parse: StockDetail field extraction ===
+
+def legacy_parse_goodinfo_detail(html):
+    """The per-field regex extractor that parse_goodinfo_detail() replaced."""
+    def extract(field_name):
+        if field_name == "主要業務":
+            p_match = re.search(fr"<nobr>{field_name}</nobr>.*?<p[^>]*>(.*?)</p>", html, re.DOTALL | re.IGNORECASE)
+            if p_match:
+                return re.sub(r'<[^>]+>', '', p_match.group(1)).strip().replace('&nbsp;', ' ')
+
+        patterns = [
+            fr"<nobr>{field_name}</nobr>.*?<td[^>]*>(.*?)</td>",
+            fr">{field_name}</td>\s*<td[^>]*>(.*?)</td>",
+            fr">{field_name}</nobr>.*?<td[^>]*>(.*?)</td>"
+        ]
+        for pat in patterns:
+            m = re.search(pat, html, re.DOTALL | re.IGNORECASE)
+            if m:
+                return re.sub(r'<[^>]+>', '', m.group(1)).strip().replace('&nbsp;', ' ')
+        return None
+
+    def extract_market_cap():
+        patterns = [
+            r"<nobr>\s*市值(?:\s*\([^<]*\))?\s*</nobr>.*?<td[^>]*>(.*?)</td>",
+            r">市值(?:\s*\([^<]*\))?</td>\s*<td[^>]*>(.*?)</td>",
+            r">市值(?:\s*\([^<]*\))?</nobr>.*?<td[^>]*>(.*?)</td>"
+        ]
+        for pat in patterns:
+            m = re.search(pat, html, re.DOTALL | re.IGNORECASE)
+            if m:
+                return re.sub(r'<[^>]+>', '', m.group(1)).strip().replace('&nbsp;', ' ')
+        return None
+
+    main_biz = extract("主要業務")
+    concepts = extract("相關概念")
+    market_cap = extract_market_cap()
+    if not market_cap:
+        market_cap = extract("市值") or extract("目前市值") or extract("總市值")
+    return main_biz, concepts, market_cap
+
+
+def synthetic_detail_page(stock_id, filler_kb=400):
+    """A StockDetail-shaped page padded with unrelated tables to a realistic size."""
+    row = "<tr><td class='bg_h1'><nobr>欄位{i}</nobr></td><td>值{i}</td><td><a href='x.asp?i={i}'>連結</a></td></tr>"
+    filler = []
+    size, i = 0, 0
+    while size < filler_kb * 1024:
+        chunk = row.format(i=i)
+        filler.append(chunk)
+        size += len(chunk.encode("utf-8"))
+        i += 1
+    half = len(filler) // 2
+    return (
+        "<html><head><script>var x = 1;</script></head><body><table>"
+        + "".join(filler[:half])
+        + f"<tr><td><nobr>市值 (億)</nobr></td><td>{stock_id}.5億</td></tr>"
+        + "".join(filler[half:])
+        + "<tr><td><nobr>相關概念</nobr></td></tr><tr><td>Apple概念;nVidia概念;AI伺服器</td></tr>"
+        + f"<tr><td><nobr>主要業務</nobr></td></tr><tr><td><p class='p_desc'>公司 {stock_id} 主要業務&nbsp;說明</p></td></tr>"
+        + "</table></body></html>"
+    )
+
+
+def load_detail_pages(pages_dir=None, cache_path=None, limit=200):
+    """Saved StockDetail pages: *.html files in `pages_dir`, else the page cache."""
+    pages = []
+    if pages_dir:
+        for name in sorted(os.listdir(pages_dir))[:limit]:
+            if name.endswith((".html", ".htm")):
+                with open(os.path.join(pages_dir, name), encoding="utf-8", errors="replace") as f:
+                    pages.append(f.read())
+    elif cache_path and os.path.exists(cache_path):
+        conn = sqlite3.connect(cache_path)
+        rows = conn.execute(
+            "SELECT body FROM pages WHERE page_type = 'detail' LIMIT ?", (limit,)
+        ).fetchall()
+        conn.close()
+        pages = [zlib.decompress(r[0]).decode("utf-8") for r in rows]
+        # Pages extracted in the browser are cached as JSON, not HTML
+        pages = [p for p in pages if not p.startswith(fci.EXTRACTED_PAGE_PREFIX)]
+    return pages
+
+
+def bench_parse(args):
+    pages = load_detail_pages(args.pages, args.cache)
+    if pages:
+        print(f"Benchmarking {len(pages)} saved StockDetail pages")
+    else:
+        print("No saved pages found — using 20 synthetic StockDetail pages (~400 KB each)")
+        pages = [synthetic_detail_page(str(1000 + i)) for i in range(20)]
+    avg_kb = statistics.mean(len(p.encode("utf-8")) for p in pages) / 1024
+    print(f"Average page size: {avg_kb:.0f} KB, {args.repeat} repeats per page")
+
+    before, after = [], []
+    mismatches = 0
+    for html in pages:
+        before += _timeit(legacy_parse_goodinfo_detail, html, args.repeat)
+        after += _timeit(fci.parse_goodinfo_detail, html, args.repeat)
+        if legacy_parse_goodinfo_detail(html) != fci.parse_goodinfo_detail(html):
+            mismatches += 1
+
+    _report("before", before)
+    _report("after", after)
+    print(f"  speed-up {statistics.mean(before) / statistics.mean(after):.1f}x, "
+          f"{mismatches}/{len(pages)} pages with differing output")
+
+
+# === isin: ISIN listing parse (full read_html vs streaming filtered parser) ===
+
+def legacy_parse_isin(content, wanted_ids):
+    """The decode-everything + pd.read_html path that iter_isin_rows() replaced."""
+    df = pd.read_html(StringIO(content.decode("big5", errors="replace")))[0]
+    df.columns = df.iloc[0]
+    df = df.iloc[1:].copy()
+    df = df.rename(columns={"有價證券代號及名稱": "代號名稱"})
+    df = df[df["代號名稱"].astype(str).str.match(r"^\d+")].copy()
+    df["代號"] = df["代號名稱"].str.extract(r"^(\S+)")
+    df["名稱_官方"] = df["代號名稱"].str.replace(r"^\S+", "", regex=True).str.strip()
+    df = df[df["代號"].isin(wanted_ids)]
+    return sorted(zip(df["代號"], df["名稱_官方"], df["產業別"]))
+
+
+def streaming_parse_isin(content, wanted_ids):
+    """FetchCompanyInfo's path: chunked bytes -> iter_isin_rows(), filtered while parsing."""
+    chunks = (content[i:i + fci.ISIN_CHUNK_SIZE] for i in range(0, len(content), fci.ISIN_CHUNK_SIZE))
+    return sorted(
+        (stock_id, name, row["產業別"])
+        for stock_id, name, row in fci.iter_isin_rows(chunks, wanted_ids)
+    )
+
+
+def synthetic_isin_page(rows=40000):
+    """A Big5 C_public.jsp-shaped listing with `rows` securities and section rows."""
+    header = ("<tr align=center><td bgcolor=#D5FFD5>有價證券代號及名稱 </td><td bgcolor=#D5FFD5>國際證券辨識號碼(ISIN Code)</td>"
+              "<td bgcolor=#D5FFD5>上市日</td><td bgcolor=#D5FFD5>市場別</td><td bgcolor=#D5FFD5>產業別</td>"
+              "<td bgcolor=#D5FFD5>CFICode</td><td bgcolor=#D5FFD5>備註</td></tr>")
+    body = []
+    for i in range(rows):
+        if i % 5000 == 0:
+            body.append("<tr><td bgcolor=#FAFAD2 colspan=7 ><B> 股票 <B> </td></tr>")
+        code = str(1000 + i)
+        body.append(f"<tr><td bgcolor=#FAFAD2>{code}　公司{code}</td><td bgcolor=#FAFAD2>TW000{code}00{i % 10}</td>"
+                    f"<td bgcolor=#FAFAD2>1994/09/05</td><td bgcolor=#FAFAD2>上市</td><td bgcolor=#FAFAD2>半導體業</td>"
+                    f"<td bgcolor=#FAFAD2>ESVUFR</td><td bgcolor=#FAFAD2></td></tr>")
+    html = ("<html><head><meta http-equiv='Content-Type' content='text/html; charset=MS950'></head><body>"
+            "<table class='h4' align=center cellSpacing=3 cellPadding=2 width=750 border=0>"
+            + header + "".join(body) + "</table></body></html>")
+    return html.encode("big5")
+
+
+def _current_rss_kb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() // 1024
+
+
+def _measure_in_child(conn, func, content, wanted_ids):
+    baseline = _current_rss_kb()
+    t0 = time.perf_counter()
+    result = func(content, wanted_ids)
+    elapsed = (time.perf_counter() - t0) * 1000
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    conn.send((elapsed, max(peak - baseline, 0), result))
+    conn.close()
+
+
+def _measure(func, content, wanted_ids):
+    """(ms, peak RSS growth in KB, result) of one call, measured in a fresh forked process."""
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_measure_in_child, args=(child, func, content, wanted_ids))
+    proc.start()
+    elapsed, peak_kb, result = parent.recv()
+    proc.join()
+    return elapsed, peak_kb, result
+
+
+def bench_isin(args):
+    if args.page:
+        with open(args.page, "rb") as f:
+            content = f.read()
+        print(f"Benchmarking saved ISIN listing {args.page}")
+    else:
+        content = synthetic_isin_page(args.rows)
+        print(f"Benchmarking a synthetic ISIN listing with {args.rows} rows")
+    if os.path.exists(fci.INPUT_CSV):
+        wanted_ids = set(pd.read_csv(fci.INPUT_CSV, dtype={"代號": str})["代號"].astype(str).str.strip())
+    else:
+        wanted_ids = {str(1000 + i) for i in range(0, 142 * 50, 50)}
+    print(f"Page size: {len(content) / 1024 / 1024:.1f} MB, keeping {len(wanted_ids)} watchlist IDs, {args.repeat} repeats")
+
+    results = {}
+    for label, func in (("before", legacy_parse_isin), ("after", streaming_parse_isin)):
+        runs = [_measure(func, content, wanted_ids) for _ in range(args.repeat)]
+        timings = [r[0] for r in runs]
+        _report(label, timings)
+        print(f"  {'':<8} peak RSS growth {max(r[1] for r in runs) / 1024:8.1f} MB")
+        results[label] = runs[0][2]
+
+    same = results["before"] == results["after"]
+    print(f"  {len(results['after'])} rows kept, output {'identical' if same else 'DIFFERS'}")
+
+
+# === assemble: post-fetch merge / coalesce / write-back ===
+
+def synthetic_assembly_inputs(rows):
+    """Watchlist, four ISIN listings, scraped details, previous output and LLM results for `rows` stocks."""
+    ids = [str(100000 + i) for i in range(rows)]
+    base = pd.DataFrame({"代號": ids, "名稱": [f"公司{sid}" for sid in ids]})
+
+    def listing(market, offset):
+        sub = ids[offset::4]
+        return pd.DataFrame({"代號": sub, "市場別": market, "產業別": [f"產業{int(s) % 30}" for s in sub]})
+
+    listings = [listing("上市", 0), listing("上櫃", 1), listing("興櫃", 2), listing("公開發行", 3)]
+    details = {
+        sid: (f"業務{sid}", "Apple概念;AI伺服器" if i % 3 else "", f"{i}億" if i % 5 else None)
+        for i, sid in enumerate(ids) if i % 7
+    }
+    prev = pd.DataFrame({
+        "市值": [f"{i}億(舊)" for i in range(rows)],
+        "市值_timestamp": "2026-01-01 00:00:00",
+    }, index=pd.Index(ids, name="代號"))
+    llm = {sid: "nVidia概念" for sid in ids[::5]}
+    return base, listings, details, prev, llm
+
+
+def legacy_assemble(base, listings, details, prev, llm, run_stamp="2026-01-02 00:00:00"):
+    """The chained merge / fillna / iterrows / per-result mask assembly that main() used to do."""
+    suffixes = ["TWSE", "TPEX", "EMG", "PUB"]
+    merged = base
+    for suffix, listing in zip(suffixes, listings):
+        merged = merged.merge(
+            listing.rename(columns={"市場別": f"市場別_{suffix}", "產業別": f"產業別_{suffix}"}),
+            on="代號", how="left",
+        )
+    for col in ("市場別", "產業別"):
+        merged[col] = (
+            merged[f"{col}_TWSE"].fillna(merged[f"{col}_TPEX"])
+            .fillna(merged[f"{col}_EMG"]).fillna(merged[f"{col}_PUB"])
+        )
+    for col in ("主要業務", "相關概念", "市值", "主要業務_timestamp", "相關概念_timestamp", "市值_timestamp"):
+        merged[col] = None
+
+    for idx, row in merged.iterrows():
+        stock_id = str(row["代號"])
+        if stock_id not in details:
+            continue
+        mb, cc, mv = details[stock_id]
+        merged.at[idx, "主要業務"] = mb
+        merged.at[idx, "相關概念"] = cc
+        merged.at[idx, "主要業務_timestamp"] = run_stamp
+        merged.at[idx, "相關概念_timestamp"] = run_stamp
+        if mv is not None:
+            merged.at[idx, "市值"] = mv
+            merged.at[idx, "市值_timestamp"] = run_stamp
+
+    prev_market_cap = prev["市值"].dropna().to_dict()
+    prev_market_cap_ts = prev["市值_timestamp"].to_dict()
+    for idx, row in merged.iterrows():
+        if pd.isna(row["市值"]) or row["市值"] is None:
+            fallback = prev_market_cap.get(str(row["代號"]))
+            if fallback:
+                merged.at[idx, "市值"] = fallback
+                merged.at[idx, "市值_timestamp"] = prev_market_cap_ts.get(str(row["代號"]))
+
+    for sid, concepts in llm.items():
+        mask = merged["代號"] == sid
+        if mask.any():
+            idx = merged[mask].index[0]
+            existing = merged.at[idx, "相關概念"]
+            if pd.isna(existing) or existing is None or str(existing).strip() == "":
+                merged.at[idx, "相關概念"] = concepts
+            else:
+                merged.at[idx, "相關概念"] = f"{existing};{concepts}"
+    return merged
+
+
+def vectorized_assemble(base, listings, details, prev, llm, run_stamp="2026-01-02 00:00:00"):
+    """FetchCompanyInfo's assembly on a single frame indexed by 代號."""
+    merged = fci.coalesce_listings(base, listings)
+    for col in ("主要業務", "相關概念", "市值", "主要業務_timestamp", "相關概念_timestamp", "市值_timestamp"):
+        merged[col] = None
+    fci.apply_detail_results(merged, details, run_stamp)
+    fci.apply_market_cap_fallback(merged, prev)
+    fci.merge_llm_concepts(merged, llm)
+    return merged.reset_index(drop=True)
+
+
+ASSEMBLED_COLUMNS = ["代號", "市場別", "產業別", "主要業務", "相關概念", "市值", "市值_timestamp"]
+
+
+def _same_assembly(a, b):
+    a = a[ASSEMBLED_COLUMNS].astype(object).where(a[ASSEMBLED_COLUMNS].notna(), None)
+    b = b[ASSEMBLED_COLUMNS].astype(object).where(b[ASSEMBLED_COLUMNS].notna(), None)
+    return a.values.tolist() == b.values.tolist()
+
+
+def bench_assemble(args):
+    print(f"Post-fetch assembly on synthetic watchlists, {args.repeat} repeats")
+    per_row = {}
+    for rows in args.sizes:
+        inputs = synthetic_assembly_inputs(rows)
+        print(f"{rows} rows:")
+        before = _timeit(lambda x: legacy_assemble(*x), inputs, args.repeat)
+        after = _timeit(lambda x: vectorized_assemble(*x), inputs, args.repeat)
+        _report("before", before)
+        _report("after", after)
+        same = _same_assembly(legacy_assemble(*inputs), vectorized_assemble(*inputs))
+        print(f"  speed-up {statistics.mean(before) / statistics.mean(after):.1f}x, "
+              f"output {'identical' if same else 'DIFFERS'}")
+        per_row[rows] = (statistics.mean(before) / rows * 1000, statistics.mean(after) / rows * 1000)
+
+    print("Cost per 1k rows (flat = linear):")
+    for rows, (before, after) in per_row.items():
+        print(f"  {rows:>7} rows   before {before:8.2f} ms   after {after:8.2f} ms")
+
+
+# === concepts: concept flag generation ===
+
+def legacy_build_concept_flags(concepts_text):
+    """The per-row tokenize + nested keyword scan that concept_flag_matrix() replaced."""
+    if pd.isna(concepts_text) or concepts_text is None:
+        text = ""
+    else:
+        text = str(concepts_text)
+
+    lowered = text.lower()
+    tokens = [t.strip().lower() for t in re.split(r"[;,、/|\\s]+", text) if t.strip()]
+
+    flags = {}
+    for col, keywords in fci.CONCEPT_KEYWORDS.items():
+        found = False
+        for kw in keywords:
+            kw_l = kw.lower()
+            if kw_l in lowered or any(kw_l in token for token in tokens):
+                found = True
+                break
+        flags[col] = 1 if found else 0
+    return flags
+
+
+def legacy_concept_flags(texts):
+    flags_df = pd.Series(texts).apply(legacy_build_concept_flags).apply(pd.Series)
+    return flags_df[fci.CONCEPT_COLUMNS].fillna(0).astype(int).to_numpy()
+
+
+def synthetic_concept_corpus(rows, seed=0):
+    """相關概念-like strings: GoodInfo concept tags, keyword hits and LLM-appended tails."""
+    rng = random.Random(seed)
+    tags = ["AI伺服器", "散熱", "CoWoS", "電動車", "5G", "矽光子", "機器人", "低軌衛星", "記憶體", "PCB",
+            "Apple概念", "nVidia概念", "TSMC供應鏈", "HP Inc", "Hewlett-Packard", "Meta Quest",
+            "輝達", "蘋果", "微軟Azure", "Google TPU", "AMD MI300", "Intel", "ASML EUV", "ARM Holdings"]
+    corpus = []
+    for _ in range(rows):
+        picked = rng.sample(tags, rng.randint(0, 6))
+        corpus.append(";".join(picked) if picked else None)
+    return corpus
+
+
+def bench_concepts(args):
+    if args.csv:
+        texts = pd.read_csv(args.csv, dtype=str).get("相關概念", pd.Series(dtype=object)).tolist()
+        print(f"Benchmarking {len(texts)} 相關概念 strings from {args.csv}")
+    else:
+        texts = synthetic_concept_corpus(args.rows)
+        print(f"Benchmarking {len(texts)} synthetic 相關概念 strings")
+
+    before = _timeit(legacy_concept_flags, texts, args.repeat)
+    after = _timeit(fci.concept_flag_matrix, texts, args.repeat)
+    _report("before", before)
+    _report("after", after)
+    same = (legacy_concept_flags(texts) == fci.concept_flag_matrix(texts)).all()
+    print(f"  speed-up {statistics.mean(before) / statistics.mean(after):.1f}x, "
+          f"flags {'identical' if same else 'DIFFER'}")
+
+
+# === llm: LLM stage against the offline stand-in ===
+
+def bench_llm(args):
+    """Runs fetch_llm_concepts() against llm_standin at several watchlist sizes."""
+    answers = llm_standin.load_canned_answers(args.answers) if args.answers else {}
+    keys = {f"{fci.LLM_KEY_ENV}_{i}": f"standin-key-{i}" for i in range(1, args.keys + 1)}
+    saved_env = {name: os.environ.get(name) for name in
+                 [f"{fci.LLM_KEY_ENV}_{i}" for i in range(1, fci.LLM_MAX_KEYS + 1)]}
+    for name in saved_env:
+        os.environ.pop(name, None)
+    os.environ.update(keys)
+    # Per-key limiter settings for this run (the real defaults are tuned for quota, not speed)
+    fci.RATE_LIMITER.settings["llm"] = {
+        **fci.RATE_LIMITER.settings["llm"],
+        "rate": args.rate, "max_rate": args.rate, "backoff_base": args.backoff,
+    }
+
+    print(f"LLM stand-in: {args.keys} key(s), latency {args.latency}s, 503 rate {args.overload_rate}, "
+          f"429 rate {args.rate_limit_rate}, truncation rate {args.truncate_rate}, {args.rate} calls/s per key")
+    rows = []
+    try:
+        for size in args.sizes:
+            stocks = [(str(100000 + i), f"公司{i}") for i in range(size)]
+            stats = llm_standin.StandInStats()
+            seeds = iter(range(1000))
+
+            def factory(api_key):
+                return llm_standin.StandInLLMClient(
+                    latency=args.latency, overload_rate=args.overload_rate,
+                    rate_limit_rate=args.rate_limit_rate, truncate_rate=args.truncate_rate,
+                    answers=answers, stats=stats, seed=next(seeds),
+                )
+
+            t0 = time.perf_counter()
+            results = fci.fetch_llm_concepts(stocks, token_budget=args.token_budget, client_factory=factory)
+            wall = time.perf_counter() - t0
+            expected = {}
+            for sid, _ in stocks:
+                answer = answers.get(sid) or llm_standin.default_answer(sid)
+                if answer.lower() != "none":
+                    expected[sid] = answer.replace(",", ";")
+            correct = sum(1 for sid, c in expected.items() if results.get(sid) == c)
+            rows.append((size, wall, stats.calls, stats.retries(), correct, len(expected)))
+    finally:
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    print("\n  stocks     wall (s)   calls   retries   related answers merged")
+    for size, wall, calls, retries, correct, expected in rows:
+        print(f"  {size:>6}   {wall:9.2f}   {calls:5d}   {retries:7d}   {correct}/{expected}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for FetchCompanyInfo.py")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p_parse = sub.add_parser("parse", help="StockDetail field extraction: per-field regex vs single pass")
+    p_parse.add_argument("--pages", default=None, help="Directory of saved StockDetail *.html pages")
+    p_parse.add_argument("--cache", default=fci.DEFAULT_CACHE_PATH, help="Page cache to read saved pages from")
+    p_parse.add_argument("--repeat", type=int, default=20)
+    p_parse.set_defaults(func=bench_parse)
+
+    p_isin = sub.add_parser("isin", help="ISIN listing: full pd.read_html vs streaming filtered parser")
+    p_isin.add_argument("--page", default=None, help="Saved raw (Big5) C_public.jsp response")
+    p_isin.add_argument("--rows", type=int, default=40000, help="Rows in the synthetic listing")
+    p_isin.add_argument("--repeat", type=int, default=3)
+    p_isin.set_defaults(func=bench_isin)
+
+    p_assemble = sub.add_parser("assemble", help="Post-fetch assembly: chained merge + iterrows vs indexed vectorized frame")
+    p_assemble.add_argument("--sizes", type=int, nargs="+", default=[2000, 20000])
+    p_assemble.add_argument("--repeat", type=int, default=3)
+    p_assemble.set_defaults(func=bench_assemble)
+
+    p_concepts = sub.add_parser("concepts", help="Concept flags: per-row keyword scan vs combined regex into a uint8 matrix")
+    p_concepts.add_argument("--rows", type=int, default=100000, help="Rows in the synthetic corpus")
+    p_concepts.add_argument("--csv", default=None, help="CSV with a 相關概念 column to use instead")
+    p_concepts.add_argument("--repeat", type=int, default=3)
+    p_concepts.set_defaults(func=bench_concepts)
+
+    p_llm = sub.add_parser("llm", help="LLM stage (batching, key rotation, retries, merge) against an offline stand-in")
+    p_llm.add_argument("--sizes", type=int, nargs="+", default=[200, 1000, 3000])
+    p_llm.add_argument("--keys", type=int, default=4, help="Simulated GEMINI_API_KEY_n slots")
+    p_llm.add_argument("--latency", type=float, default=0.2, help="Mean seconds per stand-in call")
+    p_llm.add_argument("--overload-rate", type=float, default=0.05, help="Chance of a 503 per call")
+    p_llm.add_argument("--rate-limit-rate", type=float, default=0.05, help="Chance of a 429 per call")
+    p_llm.add_argument("--truncate-rate", type=float, default=0.1, help="Chance a reply stops halfway")
+    p_llm.add_argument("--answers", default=None, help="Canned StockID,Matched_Concepts CSV")
+    p_llm.add_argument("--token-budget", type=int, default=fci.LLM_TOKEN_BUDGET)
+    p_llm.add_argument("--rate", type=float, default=20.0, help="Limiter calls/s per key")
+    p_llm.add_argument("--backoff", type=float, default=0.2, help="Limiter backoff base seconds")
+    p_llm.set_defaults(func=bench_llm)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,32 @@
+import argparse
+import codecs
+import hashlib
+import json
+import numpy as np
 import pandas as pd
+import queue
 import requests
+import threading
 import urllib3
 import re
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from io import StringIO
+from urllib.parse import quote, unquote, urljoin
 from dotenv import load_dotenv
+from lxml import etree
+from lxml import html as lxml_html
+
+from driver_manager import ManagedDriver, cached_driver_path, report_drivers, DEFAULT_MAX_PAGES, DEFAULT_MAX_RSS_MB
+from goodinfo_http import GoodInfoHttp
+from http_cache import HttpCache, new_session
+from journal import RunJournal, DEFAULT_JOURNAL_PATH
+from llm_cache import LLMConceptCache, DEFAULT_LLM_CACHE_TTL
+from page_cache import PageCache, DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES
+from rate_limiter import RATE_LIMITER
+from scrape_pipeline import ScrapePipeline, SKIP_ITEM, RELOAD, DEFAULT_PARSE_WORKERS
 
 # Load environment variables from .env file for local development
 load_dotenv()
@@ -17,9 +37,7 @@ try:
     from selenium.webdriver.chrome.options import Options
     from selenium.webdriver.chrome.service import Service
     from webdriver_manager.chrome import ChromeDriverManager
-    from selenium.webdriver.common.by import By
     from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.webdriver.support import expected_conditions as EC
     SELENIUM_AVAILABLE = True
 except ImportError:
     SELENIUM_AVAILABLE = False
@@ -34,9 +52,21 @@ except ImportError:
 # Suppress only the single warning from urllib3 needed.
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Static sources (ISIN / MoneyDJ / TAIFEX) are fetched concurrently over one pooled session,
+# through the conditional-GET cache (configured in main())
+STATIC_SOURCE_WORKERS = 8
+HTTP_SESSION = new_session(STATIC_SOURCE_WORKERS)
+HTTP_CACHE = HttpCache()
+
 # ... [Existing Constants] ...
 INPUT_CSV = "StockID_TWSE_TPEX.csv"
+FOCUS_CSV = "StockID_TWSE_TPEX_focus.csv"     # the names that matter most: scraped first
 OUTPUT_CSV = "raw_companyinfo.csv"
+
+# ETFs whose constituent weights become ETF_{代號}_權重 columns
+ETF_LIST_CSV = "ETF_list.csv"                        # 代號,名稱 — one ETF per row
+DEFAULT_ETF_IDS = ("0050", "0056", "00878", "00919")  # used when ETF_LIST_CSV is missing
+MONEYDJ_ETF_URL = "https://www.moneydj.com/ETF/X/Basic/Basic0007B.xdjhtm?etfid={etf_id}.TW"
 BASE_URL = "https://isin.twse.com.tw/isin/C_public.jsp?strMode={mode}"
 HEADERS = {
     "User-Agent": (
@@ -46,6 +76,82 @@ HEADERS = {
     )
 }
 
+GOODINFO_BASE_URL = "https://goodinfo.tw/tw/"
+GOODINFO_DETAIL_URL = GOODINFO_BASE_URL + "StockDetail.asp?STOCK_ID={stock_id}"
+GOODINFO_GROUP_CAT = "MARKET_CAT=%E9%9B%86%E5%9C%98%E8%82%A1"   # 集團股
+GOODINFO_GROUP_LIST_URL = GOODINFO_BASE_URL + f"StockList.asp?{GOODINFO_GROUP_CAT}&SHEET=%E8%82%A1%E7%A5%A8%E6%B8%85%E5%96%AE"
+
+# Bulk 市值: one StockList sheet per (market, industry) instead of one StockDetail page per stock
+GOODINFO_LIST_MARKETS = ("上市", "上櫃")      # MARKET_CAT values that have per-industry sheets
+GOODINFO_MARKET_CAP_SHEET = "公司基本資料"      # StockList sheet carrying a 市值(億) column
+GOODINFO_INDUSTRY_LIST_URL = GOODINFO_BASE_URL + "StockList.asp?MARKET_CAT={market}&INDUSTRY_CAT={industry}&SHEET={sheet}"
+
+# Persisted group -> members index
+GROUP_INDEX_PATH = os.path.join(".cache", "goodinfo_groups.json")
+GROUP_INDEX_TTL = 7 * 86400          # re-check the group listing weekly
+GROUP_RECRAWL_MAX_AGE = 30 * 86400   # re-crawl an unchanged group at least monthly
+
+# GoodInfo scraping pool defaults
+GOODINFO_WORKERS = 1
+GOODINFO_MIN_INTERVAL = 1.0      # floor on seconds between page loads, shared by the whole pool
+CIRCUIT_BREAKER_THRESHOLD = 5    # consecutive failures (pool-wide) before aborting
+PAGE_LOAD_TIMEOUT = 60           # seconds; generous for CI runners
+
+# Text GoodInfo shows instead of the requested page when it throttles or blocks us.
+# Block and not-found texts are matched against the visible body text (not scripts or
+# markup), and only count when the page yielded none of the expected content.
+GOODINFO_BLOCK_SIGNATURES = ("瀏覽量異常", "Too Many Requests", "Access Denied", "403 Forbidden")
+# The JS "Initializing" challenge: a script-only redirect page without any table cells
+GOODINFO_CHALLENGE_SIGNATURES = ("Initializing", "window.location.replace")
+# Text GoodInfo shows for a stock it does not list
+GOODINFO_NOT_FOUND_SIGNATURES = ("查無此股票", "查無資料", "不存在")
+
+# What a GoodInfo page load turned out to be (see classify_page()). Block and not-found
+# pages are recognised as soon as they render instead of after the content timeout.
+PAGE_OK, PAGE_CHALLENGE, PAGE_BLOCKED, PAGE_NOT_FOUND, PAGE_EMPTY, PAGE_ERROR = (
+    "ok", "challenge", "blocked", "not_found", "empty", "error")
+HTTP_STATUS_OUTCOMES = {403: PAGE_BLOCKED, 429: PAGE_BLOCKED, 503: PAGE_BLOCKED, 404: PAGE_NOT_FOUND}
+GOODINFO_PAGE_WAIT = 20          # seconds a page may stay unrecognisable (e.g. an unresolved challenge)
+
+# GoodInfo pages over plain HTTP with cookies exported from a driver that passed the JS
+# challenge; the browser is only used to (re-)solve it (configured in main())
+GOODINFO_FETCH_MODES = ("http", "browser")
+GOODINFO_HTTP = GoodInfoHttp()
+
+# Browser profiles: "scrape" loads only what the page text needs, "full" is plain headless Chrome
+BROWSER_PROFILES = ("scrape", "full")
+BLOCKED_URL_PATTERNS = [
+    # Images, fonts, media and stylesheets
+    "*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.svg*", "*.ico*",
+    "*.woff*", "*.ttf*", "*.otf*", "*.eot*", "*.mp4*", "*.webm*", "*.css*",
+    # Ad / analytics / tracker hosts
+    "*doubleclick.net*", "*googlesyndication.com*", "*googleadservices.com*",
+    "*google-analytics.com*", "*googletagmanager.com*", "*googletagservices.com*",
+    "*adservice.google.*", "*amazon-adsystem.com*", "*adnxs.com*", "*criteo.*",
+    "*taboola.com*", "*outbrain.com*", "*scorecardresearch.com*", "*facebook.net*",
+    "*facebook.com/tr*", "*clarity.ms*", "*hotjar.com*", "*pubmatic.com*", "*rubiconproject.com*",
+]
+
+# Incremental mode: how long each GoodInfo field stays fresh (seconds)
+FIELD_TTLS = {
+    "市值": 20 * 3600,           # fast-moving, refreshed on every daily run
+    "主要業務": 30 * 86400,
+    "相關概念": 30 * 86400,
+    "相關集團": 7 * 86400,
+}
+DETAIL_FIELDS = ["主要業務", "相關概念", "市值"]    # all scraped from StockDetail.asp
+FRESHNESS_COLUMNS = [f"{field}_timestamp" for field in FIELD_TTLS]
+
+# Scrape order: weighted sum of focus-list membership, how stale the stalest detail field
+# is, and the stock's TAIEX weight percentile (each scaled to 0..1)
+PRIORITY_WEIGHTS = {"focus": 2.0, "staleness": 1.0, "taiex_weight": 1.0}
+STALENESS_CAP = 3.0              # fields older than 3x their TTL (or never fetched) are all equally stale
+DEADLINE_RESERVE = 5 * 60        # --deadline: seconds kept back after scraping for the LLM stage
+DEADLINE_RESERVE_MAX_SHARE = 0.25  # ...but never more than this share of the budget
+DEADLINE_OUTPUT_MARGIN = 30      # --deadline: seconds kept back at the very end for writing the output
+DEADLINE_OUTPUT_MAX_SHARE = 0.1  # ...capped at this share of the budget for short budgets
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
 CONCEPT_KEYWORDS = {
     "TSMC概念": ["tsmc", "台積電"],
     "nVidia概念": ["nvidia", "輝達"],
@@ -71,25 +177,44 @@ CONCEPT_KEYWORDS = {
 }
 CONCEPT_COLUMNS = list(CONCEPT_KEYWORDS.keys())
 
-def build_concept_flags(concepts_text):
-    if pd.isna(concepts_text) or concepts_text is None:
-        text = ""
-    else:
-        text = str(concepts_text)
+def _compile_concept_matcher(concept_keywords):
+    """
+    Compiles every keyword into one regex. The alternation sits inside a lookahead,
+    so finditer() tries each position of the text exactly once and reports the
+    longest keyword starting there. A keyword implies the columns of every keyword
+    that is a prefix of it, so overlapping keywords are never lost.
+    Returns (pattern, { keyword: column indices }).
+    """
+    keyword_cols = {}
+    for col_idx, keywords in enumerate(concept_keywords.values()):
+        for kw in keywords:
+            keyword_cols.setdefault(kw.lower(), set()).add(col_idx)
+    implied = {
+        kw: sorted(set().union(*(cols for other, cols in keyword_cols.items() if kw.startswith(other))))
+        for kw in keyword_cols
+    }
+    alternation = "|".join(re.escape(kw) for kw in sorted(keyword_cols, key=len, reverse=True))
+    return re.compile(f"(?=({alternation}))"), implied
 
-    lowered = text.lower()
-    tokens = [t.strip().lower() for t in re.split(r"[;,、/|\\s]+", text) if t.strip()]
+_CONCEPT_PATTERN, _CONCEPT_KEYWORD_COLS = _compile_concept_matcher(CONCEPT_KEYWORDS)
 
-    flags = {}
-    for col, keywords in CONCEPT_KEYWORDS.items():
-        found = False
-        for kw in keywords:
-            kw_l = kw.lower()
-            if kw_l in lowered or any(kw_l in token for token in tokens):
-                found = True
-                break
-        flags[col] = 1 if found else 0
-    return flags
+def concept_flag_matrix(texts):
+    """
+    Flags every text against CONCEPT_KEYWORDS (case-insensitive substring match).
+    Each distinct text is scanned once. Returns a uint8 matrix of shape
+    (len(texts), len(CONCEPT_COLUMNS)).
+    """
+    codes, uniques = pd.factorize(pd.Series(texts, dtype=object))
+    # Last row stays all-zero for missing texts (factorize code -1)
+    flags = np.zeros((len(uniques) + 1, len(CONCEPT_COLUMNS)), dtype=np.uint8)
+    for row, text in enumerate(uniques):
+        for m in _CONCEPT_PATTERN.finditer(str(text).lower()):
+            flags[row, _CONCEPT_KEYWORD_COLS[m.group(1)]] = 1
+    return flags[codes]
+
+def build_concept_flags(concepts_text):
+    row = concept_flag_matrix([concepts_text])[0]
+    return {col: int(flag) for col, flag in zip(CONCEPT_COLUMNS, row)}
 
 def add_concept_flag_columns(df):
     if "相關概念" not in df.columns:
@@ -97,16 +222,21 @@ def add_concept_flag_columns(df):
             df[col] = 0
         return df
 
-    flags_df = df["相關概念"].apply(build_concept_flags).apply(pd.Series)
-    for col in CONCEPT_COLUMNS:
-        df[col] = flags_df[col].fillna(0).astype(int)
+    flags = concept_flag_matrix(df["相關概念"].to_numpy())
+    for i, col in enumerate(CONCEPT_COLUMNS):
+        df[col] = flags[:, i]
     return df
 
-def get_selenium_driver():
+def get_selenium_driver(profile="scrape"):
+    """
+    profile="scrape": returns once the DOM is ready (pageLoadStrategy=eager), with
+    images disabled and images/fonts/media/CSS and ad/analytics hosts blocked via CDP.
+    profile="full": plain headless Chrome, for comparison.
+    """
     if not SELENIUM_AVAILABLE:
         return None
 
-    print("Initializing Selenium Driver...")
+    print(f"Initializing Selenium Driver ({profile} profile)...")
     options = Options()
     options.add_argument("--headless")
     options.add_argument("--disable-gpu")
@@ -114,300 +244,667 @@ def get_selenium_driver():
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--window-size=1920,1080")
     options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+    if profile == "scrape":
+        options.page_load_strategy = "eager"
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
 
     try:
-        service = Service(ChromeDriverManager().install())
+        service = Service(cached_driver_path(lambda: ChromeDriverManager().install()))
         driver = webdriver.Chrome(service=service, options=options)
-        # Increase timeout for CI environments (60 seconds)
-        driver.set_page_load_timeout(60)
+        _count_webdriver_commands(driver)
+        driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        if profile == "scrape":
+            try:
+                driver.execute_cdp_cmd("Network.enable", {})
+                driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+            except Exception as e:
+                print(f"Warning: Could not enable resource blocking: {e}")
         return driver
     except Exception as e:
         print(f"Failed to initialize Selenium: {e}")
         return None
 
-def get_goodinfo_group_map(driver):
+def _page_signatures():
+    return {
+        "blocked": list(GOODINFO_BLOCK_SIGNATURES),
+        "challenge": list(GOODINFO_CHALLENGE_SIGNATURES),
+        "not_found": list(GOODINFO_NOT_FOUND_SIGNATURES),
+    }
+
+def _body_text(html):
+    """Visible text of a page's body (scripts and styles left out), like innerText in the browser."""
+    try:
+        doc = lxml_html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        return ""
+    for node in doc.xpath("//script | //style | //noscript"):
+        node.drop_tree()
+    body = doc.find("body")
+    return (body if body is not None else doc).text_content()
+
+def page_signals(html):
+    """{ blocked, challenge, not_found } for a page's HTML, as the extraction prelude reports them in the browser."""
+    text = _body_text(html)
+    return {
+        "blocked": any(sig in text for sig in GOODINFO_BLOCK_SIGNATURES),
+        # The challenge page is a redirect script: its signatures live in the markup
+        "challenge": "<td" not in html.lower() and any(sig in html for sig in GOODINFO_CHALLENGE_SIGNATURES),
+        "not_found": any(sig in text for sig in GOODINFO_NOT_FOUND_SIGNATURES),
+    }
+
+def _count_webdriver_commands(driver):
+    """Counts WebDriver round-trips in driver.command_count (every command goes through execute())."""
+    execute = driver.execute
+    driver.command_count = 0
+
+    def _counted(driver_command, params=None):
+        driver.command_count += 1
+        return execute(driver_command, params)
+
+    driver.execute = _counted
+
+# === In-browser extraction ===
+# Each page type has one script, run with a single execute_script() call, that returns only
+# what the parser needs instead of shipping page_source over WebDriver. The prelude also
+# reports the page's own size (what page_source would have cost) and its network transfer.
+_EXTRACT_PRELUDE_JS = r"""
+const signatures = arguments[0];
+const html = document.documentElement ? document.documentElement.outerHTML : "";
+const body = document.body;
+const text = body ? (body.innerText !== undefined ? body.innerText : body.textContent) || "" : "";
+const inHtml = list => list.some(s => html.includes(s));
+const inText = list => list.some(s => text.includes(s));
+const entries = performance.getEntriesByType("navigation").concat(performance.getEntriesByType("resource"));
+let transferred = 0;
+for (const e of entries) { transferred += (e.transferSize || 0); }
+const out = {
+  blocked: inText(signatures.blocked),
+  challenge: !document.querySelector("td") && inHtml(signatures.challenge),
+  not_found: inText(signatures.not_found),
+  source_bytes: new TextEncoder().encode(html).length,
+  transfer: [transferred, entries.length],
+  data: null,
+};
+if (out.challenge) { return out; }
+const clean = s => (s || "").replace(/\u00a0/g, " ").trim();
+"""
+
+# StockDetail: { field: value } — a label cell is a <td>/<nobr> holding just the label
+# (optionally followed by "(…)"); the value is the next <td> (or <p>) after it.
+_DETAIL_EXTRACT_JS = r"""
+const labels = arguments[1], paragraphFields = arguments[2];
+const candidates = Array.from(document.querySelectorAll("td, nobr"));
+const after = (el, tag) => {
+  for (const x of document.getElementsByTagName(tag)) {
+    const pos = el.compareDocumentPosition(x);
+    if ((pos & Node.DOCUMENT_POSITION_FOLLOWING) && !(pos & Node.DOCUMENT_POSITION_CONTAINED_BY)) { return x; }
+  }
+  return null;
+};
+const fields = {};
+for (const [field, names] of Object.entries(labels)) {
+  let value = null;
+  for (const name of names) {
+    const re = new RegExp("^" + name.replace(/[.*+?^${}()|[\]\\]/g, "\\$&") + "\\s*(\\([^<]*\\))?$");
+    const cell = candidates.find(el => re.test(clean(el.textContent)));
+    if (!cell) { continue; }
+    let target = paragraphFields.includes(field) ? after(cell, "p") : null;
+    if (!target) { target = after(cell, "td"); }
+    if (target) {
+      value = clean(target.textContent);
+      if (value) { break; }
+    }
+  }
+  fields[field] = value;
+}
+out.data = fields;
+return out;
+"""
+
+# 集團股 index: [[link text, href, member count in the same row or null]]
+_GROUP_LINKS_EXTRACT_JS = r"""
+const anchors = [];
+for (const a of document.querySelectorAll("a[href*='" + arguments[1] + "']")) {
+  const row = a.closest("tr");
+  let count = null;
+  if (row) {
+    for (const cell of row.querySelectorAll("td, th")) {
+      const text = cell.textContent.trim();
+      if (/^\d+$/.test(text)) { count = parseInt(text, 10); break; }
+    }
+  }
+  anchors.push([a.textContent.trim(), a.getAttribute("href") || "", count]);
+}
+out.data = anchors;
+return out;
+"""
+
+# Single group page: hrefs of the member StockDetail links
+_GROUP_MEMBERS_EXTRACT_JS = r"""
+const link = "a[href*='StockDetail.asp?STOCK_ID=']";
+let links = document.querySelectorAll("table#tblStockList " + link);
+if (!links.length) { links = document.querySelectorAll("div#divStockList " + link); }
+if (!links.length) { links = document.querySelectorAll(link); }
+out.data = Array.from(links, a => a.getAttribute("href") || "");
+return out;
+"""
+
+# StockList sheet: per table, [代號, 市值] cell pairs starting at the header row
+_MARKET_CAP_EXTRACT_JS = r"""
+let tables = document.querySelectorAll("table#tblStockList");
+if (!tables.length) { tables = document.getElementsByTagName("table"); }
+out.data = [];
+for (const table of tables) {
+  let code = -1, cap = -1;
+  const rows = [];
+  for (const tr of table.getElementsByTagName("tr")) {
+    const cells = Array.from(tr.children).filter(c => c.tagName === "TD" || c.tagName === "TH").map(c => c.textContent.trim());
+    if (cap < 0) {
+      code = cells.indexOf("代號");
+      cap = code < 0 ? -1 : cells.findIndex(c => c.startsWith("市值"));
+      if (cap >= 0) { rows.push([cells[code], cells[cap]]); }
+      continue;
+    }
+    if (cells.length > Math.max(code, cap)) { rows.push([cells[code], cells[cap]]); }
+  }
+  if (rows.length > 1) { out.data.push(rows); }
+}
+return out;
+"""
+
+# Polled while a page loads (instead of waiting for one element): settles on "ready" once
+# `arguments[1]` matches, or as soon as the page is a block page or a not-found page.
+# A challenge page keeps polling until it redirects to the real page.
+_PAGE_STATE_JS = r"""
+const signatures = arguments[0];
+if (document.querySelector(arguments[1])) { return "ready"; }
+const html = document.documentElement ? document.documentElement.outerHTML : "";
+const body = document.body;
+const text = body ? (body.innerText !== undefined ? body.innerText : body.textContent) || "" : "";
+const inText = list => list.some(s => text.includes(s));
+if (inText(signatures.blocked)) { return "blocked"; }
+if (document.readyState === "complete" && !signatures.challenge.some(s => html.includes(s))
+    && inText(signatures.not_found)) {
+  return "not_found";
+}
+return null;
+"""
+
+# Page types whose extracted data is a list of links (one element read per link otherwise)
+_LINK_PAGE_TYPES = ("group_list", "group")
+
+# Cached page bodies holding extracted data instead of HTML (pages read in the browser)
+# start with this marker and the extractor_version() they were extracted with
+EXTRACTED_PAGE_PREFIX = "<!--extracted-json"
+
+def page_extractors():
+    """page type -> (extraction script, script arguments, html -> data, data -> parsed result)"""
+    return {
+        "detail": (
+            _DETAIL_EXTRACT_JS,
+            ({field: list(labels) for field, labels in DETAIL_FIELD_LABELS.items()}, sorted(DETAIL_PARAGRAPH_FIELDS)),
+            extract_detail_fields, _detail_tuple,
+        ),
+        "group_list": (_GROUP_LINKS_EXTRACT_JS, (GOODINFO_GROUP_CAT,), _group_anchors, _group_links_from_anchors),
+        "group": (_GROUP_MEMBERS_EXTRACT_JS, (), _member_hrefs, _members_from_hrefs),
+        "market_cap_list": (_MARKET_CAP_EXTRACT_JS, (), _market_cap_rows, _market_caps_from_rows),
+    }
+
+def extractor_version(page_type):
     """
-    Fetches the mapping of Stock ID -> Group Name from GoodInfo's Group List page.
-    This is much more efficient than visiting every stock page.
+    Hash of the page type's extraction script and its arguments. Extracted data
+    cached under another version is treated as a miss, so an extractor fix takes
+    effect at once instead of after the cache TTL.
+    """
+    script, script_args, _, _ = page_extractors()[page_type]
+    source = _EXTRACT_PRELUDE_JS + script + json.dumps(script_args, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+
+def _extracted_marker(page_type):
+    return f"{EXTRACTED_PAGE_PREFIX} {extractor_version(page_type)}-->"
+
+class ExtractionStats:
+    """WebDriver round-trips and bytes returned per page, per page type, against a full page_source."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}   # page type -> [pages, round-trips, payload bytes, page_source bytes, links, fallbacks]
+
+    def record(self, page_type, round_trips, payload_bytes, source_bytes, links=0, fallback=False):
+        with self._lock:
+            t = self._totals.setdefault(page_type, [0, 0, 0, 0, 0, 0])
+            for i, n in enumerate((1, round_trips, payload_bytes, source_bytes, links, int(fallback))):
+                t[i] += n
+
+    def report(self):
+        if not self._totals:
+            return
+        print("WebDriver extraction (per page: round-trips, bytes returned vs full page_source):")
+        for page_type, (pages, trips, payload, source, links, fallbacks) in sorted(self._totals.items()):
+            line = (f"  {page_type:<16} {pages} pages, {trips / pages:.1f} round-trips, "
+                    f"{payload / pages / 1024:.1f} KB vs {source / pages / 1024:.1f} KB")
+            if source:
+                line += f" ({1 - payload / source:.1%} less)"
+            if links:
+                line += f", {links / pages:.0f} links (~{2 * links / pages:.0f} round-trips reading them one at a time)"
+            if fallbacks:
+                line += f", {fallbacks} page_source fallbacks"
+            print(line)
+        self._totals = {}
+
+EXTRACTION_STATS = ExtractionStats()
+
+class PageOutcomes:
+    """GoodInfo page outcomes (see classify_page()) per page type and source ("http" / "browser")."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}   # (page type, source) -> { outcome: pages }
+
+    def record(self, page_type, source, outcome):
+        """Counts one page and returns its outcome."""
+        with self._lock:
+            counts = self._counts.setdefault((page_type, source), {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+        return outcome
+
+    def report(self):
+        if not self._counts:
+            return
+        print("GoodInfo page outcomes:")
+        for (page_type, source), counts in sorted(self._counts.items()):
+            tally = ", ".join(f"{outcome} {n}" for outcome, n in sorted(counts.items(), key=lambda c: -c[1]))
+            print(f"  {page_type:<16} {source:<8} {tally}")
+        self._counts = {}
+
+PAGE_OUTCOMES = PageOutcomes()
+
+def classify_page(page_type, page):
+    """
+    Outcome of an extracted page ({ blocked, challenge, not_found, data }):
+    PAGE_OK when the data has content, whatever the page's text says; otherwise
+    PAGE_BLOCKED or PAGE_CHALLENGE from the page's signals, else PAGE_NOT_FOUND if
+    GoodInfo said the stock does not exist and PAGE_EMPTY if it did not.
+    """
+    if page.get("data") is not None and _has_content(page_type, page["data"]):
+        return PAGE_OK
+    if page.get("blocked"):
+        return PAGE_BLOCKED
+    if page.get("challenge"):
+        return PAGE_CHALLENGE
+    return PAGE_NOT_FOUND if page.get("not_found") else PAGE_EMPTY
+
+def _settle_limiter(limiter, outcome):
+    """An answer (content or not-found) ramps the host's rate up; anything else backs off."""
+    if outcome in (PAGE_OK, PAGE_NOT_FOUND):
+        limiter.success()
+    else:
+        limiter.failure(outcome)
+
+def _wait_for_page(driver, ready_css, timeout=GOODINFO_PAGE_WAIT):
+    """
+    Polls the loading page until it settles: "ready", "blocked" or "not_found"
+    (see _PAGE_STATE_JS). Returns None if it is none of those after `timeout`.
     """
-    if driver is None:
-        return {}
-        
-    print("Fetching GoodInfo Group Map...")
-    group_map = {}
-    
     try:
-        # 1. Get list of all groups
-        url_all_groups = "https://goodinfo.tw/tw/StockList.asp?MARKET_CAT=%E9%9B%86%E5%9C%98%E8%82%A1&SHEET=%E8%82%A1%E7%A5%A8%E6%B8%85%E5%96%AE"
-        try:
-            driver.get(url_all_groups)
-        except Exception as e:
-            print(f"Timeout or error loading Group List page: {e}")
-            return {} # Abort if main list fails
-        
-        # Wait for links to appear
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.XPATH, "//a[contains(@href, 'MARKET_CAT=%E9%9B%86%E5%9C%98%E8%82%A1')]"))
+        return WebDriverWait(driver, timeout).until(
+            lambda d: d.execute_script(_PAGE_STATE_JS, _page_signatures(), ready_css)
         )
-        
-        links = driver.find_elements(By.XPATH, "//a[contains(@href, 'MARKET_CAT=%E9%9B%86%E5%9C%98%E8%82%A1')]")
-        
-        group_links = set()
-        for link in links:
-            href = link.get_attribute('href')
-            text = link.text.strip()
-            if "INDUSTRY_CAT" in href and text:
-                group_links.add((text, href))
-        
-        print(f"Found {len(group_links)} unique groups. Mapping stocks...")
-        
-        # 2. Iterate ALL groups
-        total_groups = len(group_links)
-        for i, (group_name, href) in enumerate(group_links):
-            print(f"  [{i+1}/{total_groups}] Mapping Group: {group_name}")
-            try:
-                driver.get(href)
-                # Wait for table content to load (replaces bare sleep)
-                try:
-                    WebDriverWait(driver, 15).until(
-                        EC.presence_of_element_located((By.TAG_NAME, "td"))
-                    )
-                except:
-                    time.sleep(2)
-
-                # Try specific table first, fall back to all stock links on page
-                stock_links = driver.find_elements(By.XPATH, "//table[@id='tblStockList']//a[contains(@href, 'StockDetail.asp?STOCK_ID=')]")
-                if not stock_links:
-                    stock_links = driver.find_elements(By.XPATH, "//div[@id='divStockList']//a[contains(@href, 'StockDetail.asp?STOCK_ID=')]")
-                if not stock_links:
-                    # Broadest fallback — may include sidebar links, deduplication handles it
-                    stock_links = driver.find_elements(By.XPATH, "//a[contains(@href, 'StockDetail.asp?STOCK_ID=')]")
-                
-                for sl in stock_links:
-                    shref = sl.get_attribute('href')
-                    if "STOCK_ID=" in shref:
-                        try:
-                            sid = shref.split("STOCK_ID=")[1].split("&")[0]
-                            if sid in group_map:
-                                if group_name not in group_map[sid]:
-                                    group_map[sid] += f", {group_name}"
-                            else:
-                                group_map[sid] = group_name
-                        except:
-                            pass
-            except Exception as e:
-                print(f"  Skipping group {group_name} due to error: {e}")
-                continue
-                        
-    except Exception as e:
-        print(f"Error fetching group map: {e}")
-        
-    print(f"Mapped {len(group_map)} stocks to groups.")
-    return group_map
+    except Exception:
+        return None
 
-def fetch_goodinfo_data(driver, stock_id):
-    if driver is None:
-        return None, None, None
+def _page_from_html(page_type, html):
+    """What _extract_page() returns, computed here from the page's HTML."""
+    page = page_signals(html)
+    page["data"] = None if page["challenge"] else page_extractors()[page_type][2](html)
+    return page
 
-    url = f"https://goodinfo.tw/tw/StockDetail.asp?STOCK_ID={stock_id}"
-    
+def _extract_page(driver, page_type, commands_before=0):
+    """
+    Runs the page type's extraction script: one WebDriver round-trip returning
+    { blocked, challenge, not_found, data, source_bytes, transfer: [bytes, requests] }. Falls back to
+    page_source, parsed here (and kept under "html"), if the script fails. Records the page's round-trips
+    (counted from `commands_before`) and bytes in EXTRACTION_STATS.
+    """
+    script, script_args, _, _ = page_extractors()[page_type]
     try:
-        try:
-            driver.get(url)
-        except Exception as e:
-            print(f"  Timeout/Error loading page for {stock_id}: {e}")
-            return None, None
-        
-        # Wait for the "Initializing" to pass and content to load
-        wait = WebDriverWait(driver, 15)
-        wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-        
-        try:
-            wait.until(EC.presence_of_element_located((By.TAG_NAME, "td")))
-        except:
-            pass 
-
+        page = driver.execute_script(_EXTRACT_PRELUDE_JS + script, _page_signatures(), *script_args)
+    except Exception:
+        page = None
+    if isinstance(page, dict) and "blocked" in page:
+        payload = len(json.dumps(page, ensure_ascii=False).encode("utf-8"))
+        fallback = False
+    else:
         html = driver.page_source
-        
-        def extract(field_name):
-            # Case A: Special for Main Business (often in a <p>)
-            if field_name == "主要業務":
-                # <nobr>主要業務</nobr>...<p...>(Value)</p>
-                p_match = re.search(fr"<nobr>{field_name}</nobr>.*?<p[^>]*>(.*?)</p>", html, re.DOTALL | re.IGNORECASE)
-                if p_match:
-                    return re.sub(r'<[^>]+>', '', p_match.group(1)).strip().replace('&nbsp;', ' ')
-            
-            # General fallback
-            patterns = [
-                fr"<nobr>{field_name}</nobr>.*?<td[^>]*>(.*?)</td>",
-                fr">{field_name}</td>\s*<td[^>]*>(.*?)</td>",
-                fr">{field_name}</nobr>.*?<td[^>]*>(.*?)</td>"
-            ]
-            
-            for pat in patterns:
-                m = re.search(pat, html, re.DOTALL | re.IGNORECASE)
-                if m:
-                    return re.sub(r'<[^>]+>', '', m.group(1)).strip().replace('&nbsp;', ' ')
-            return None
+        payload = len(html.encode("utf-8"))
+        page = _page_from_html(page_type, html)
+        page.update(source_bytes=payload, transfer=[0, 0], html=html)
+        fallback = True
+    links = len(page["data"] or []) if page_type in _LINK_PAGE_TYPES else 0
+    EXTRACTION_STATS.record(
+        page_type, getattr(driver, "command_count", 0) - commands_before,
+        payload, page.get("source_bytes") or 0, links, fallback,
+    )
+    return page
 
-        def extract_market_cap():
-            patterns = [
-                r"<nobr>\s*市值(?:\s*\([^<]*\))?\s*</nobr>.*?<td[^>]*>(.*?)</td>",
-                r">市值(?:\s*\([^<]*\))?</td>\s*<td[^>]*>(.*?)</td>",
-                r">市值(?:\s*\([^<]*\))?</nobr>.*?<td[^>]*>(.*?)</td>"
-            ]
-            for pat in patterns:
-                m = re.search(pat, html, re.DOTALL | re.IGNORECASE)
-                if m:
-                    return re.sub(r'<[^>]+>', '', m.group(1)).strip().replace('&nbsp;', ' ')
-            return None
+def _cached_page_data(cache, url, page_type):
+    """
+    Extracted data for a fresh cached page (None on a miss). Cached HTML is parsed
+    with the current extractor; extracted data only counts if the extractor is unchanged.
+    """
+    marker = _extracted_marker(page_type)
+    body = cache.get(
+        url, page_type,
+        accept=lambda body: not body.startswith(EXTRACTED_PAGE_PREFIX) or body.startswith(marker),
+    )
+    if body is None:
+        return None
+    if body.startswith(marker):
+        return json.loads(body[len(marker):])
+    return page_extractors()[page_type][2](body)
+
+def _cache_page_data(cache, url, page_type, page):
+    """Caches the page's HTML when it has it (fetched over HTTP), else its versioned extracted data."""
+    if page.get("html"):
+        cache.put(url, page_type, page["html"])
+    else:
+        cache.put(url, page_type, _extracted_marker(page_type) + json.dumps(page["data"], ensure_ascii=False))
 
-        main_biz = extract("主要業務")
-        concepts = extract("相關概念")
-        market_cap = extract_market_cap()
-        
-        return main_biz, concepts, market_cap
+def _has_content(page_type, data):
+    if page_type == "detail":
+        return any(data.values())
+    return bool(data)
 
-    except Exception as e:
-        print(f"Error fetching GoodInfo for {stock_id}: {e}")
-        return None, None, None
+def _fetch_goodinfo_http(url, page_type, parse=True):
+    """
+    (outcome, page) for `url` fetched over plain HTTP through the goodinfo.tw rate
+    limiter; the outcome is None when there are no exported cookies to use.
+    PAGE_OK and PAGE_NOT_FOUND are answers, anything else hands the page to the browser.
+    A page that was read keeps its HTML (for the page cache) under "html".
+    parse=False leaves a page that is not a challenge unparsed
+    (data None, outcome None) for finish_goodinfo_page() to settle: such a page is
+    only counted (served or fallback, rate limiter) once it has been classified.
+    """
+    if not GOODINFO_HTTP.ready:
+        return None, None
+    limiter = RATE_LIMITER.host(url)
+    limiter.acquire()
+    status, html, seconds = GOODINFO_HTTP.fetch(url)
+    page = {"data": None}
+    if status is None:
+        outcome = PAGE_ERROR
+    elif status in HTTP_STATUS_OUTCOMES:
+        outcome = HTTP_STATUS_OUTCOMES[status]
+    elif status != 200:
+        outcome = PAGE_CHALLENGE
+    elif parse:
+        page = dict(_page_from_html(page_type, html), html=html)
+        outcome = classify_page(page_type, page)
+    else:
+        page = dict(page_signals(html), data=None, html=html)
+        outcome = classify_page(page_type, page) if page["challenge"] else None
+    page.update(source="http", cacheable=True)
+    if outcome is None:
+        page["seconds"] = seconds
+        return outcome, page
+    _settle_http_page(page_type, limiter, outcome, seconds)
+    return outcome, page
+
+def _settle_http_page(page_type, limiter, outcome, seconds):
+    """Counts a classified HTTP page: its outcome, served vs handed to the browser, and the limiter."""
+    PAGE_OUTCOMES.record(page_type, "http", outcome)
+    if outcome in (PAGE_OK, PAGE_NOT_FOUND):
+        GOODINFO_HTTP.accept(seconds)
+    else:
+        GOODINFO_HTTP.reject(outcome)
+    # Stale cookies are expected to meet a challenge; that is no reason to slow down
+    if outcome != PAGE_CHALLENGE:
+        _settle_limiter(limiter, outcome)
 
-# ... [fetch_isin_table function] ...
+def finish_goodinfo_page(page_type, page):
+    """
+    Parse stage for a page the load stage left unparsed (fetched over HTTP, data None):
+    extracts its data from page["html"], counts the page (see _settle_http_page()) and
+    returns its outcome (see classify_page()).
+    """
+    page["data"] = page_extractors()[page_type][2](page["html"])
+    outcome = classify_page(page_type, page)
+    _settle_http_page(page_type, RATE_LIMITER.host("goodinfo.tw"), outcome, page.pop("seconds", 0.0))
+    return outcome
 
-def main():
-    # ... [Existing logic: Load CSV, Fetch ISIN, Fetch ETF] ...
-    
-    # 1) 讀 base CSV
-    base = pd.read_csv(INPUT_CSV, dtype={"代號": str})
-    base["代號"] = base["代號"].astype(str).str.strip()
+def _load_goodinfo_list_page(driver, url, page_type, ready_css, cache=None):
+    """
+    Returns the parsed content of a GoodInfo StockList page (see page_extractors()),
+    from the page cache when fresh, or None unless the page's outcome is PAGE_OK.
+    Page loads go through the goodinfo.tw rate limiter; extracted data is only
+    cached once `ready_css` has matched.
+    """
+    to_result = page_extractors()[page_type][3]
+    if cache is not None:
+        data = _cached_page_data(cache, url, page_type)
+        if data is not None:
+            return to_result(data)
+    outcome, page = _fetch_goodinfo_http(url, page_type)
+    if outcome == PAGE_OK:
+        if cache is not None:
+            _cache_page_data(cache, url, page_type, page)
+        return to_result(page["data"])
+    if outcome == PAGE_NOT_FOUND or driver is None:
+        return None
 
-    # ... [Fetch ISIN] ...
-    # (Abbreviated for patch context, assuming previous structure is maintained)
-    # Actually I need to be careful with 'replace' tool context.
-    # I will target specific insertion points or rewrite main.
-    
-    # Let's rewrite main to be safe.
-    
-    # ... [Fetch ETF] ...
-    
-    # ... [Merge] ...
-    
-    # === Fetch GoodInfo (Selenium) ===
-    # ... [Existing Code] ...
-    
-    # === Fetch Gemini Concepts ===
-    # New Logic Here
-    
-    # ... [Save]
-    if not SELENIUM_AVAILABLE:
+    limiter = RATE_LIMITER.host(url)
+    commands_before = getattr(driver, "command_count", 0)
+    limiter.acquire()
+    try:
+        driver.get(url)
+    except Exception:
+        limiter.failure("timeout")
+        raise
+    settled = _wait_for_page(driver, ready_css, timeout=15)
+
+    page = _extract_page(driver, page_type, commands_before)
+    outcome = PAGE_OUTCOMES.record(page_type, "browser", classify_page(page_type, page))
+    _settle_limiter(limiter, outcome)
+    if outcome != PAGE_OK:
         return None
-    
-    print("Initializing Selenium Driver...")
-    options = Options()
-    options.add_argument("--headless")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-    
+    if not GOODINFO_HTTP.ready:
+        GOODINFO_HTTP.adopt_browser_session(driver)
+    if cache is not None and settled == "ready":
+        _cache_page_data(cache, url, page_type, page)
+    return to_result(page["data"])
+
+def _group_member_count(anchor):
+    """Member count shown next to a group link (same table row), if the page lists one."""
+    row = next(anchor.iterancestors("tr"), None)
+    if row is None:
+        return None
+    for cell in row.iter("td", "th"):
+        text = cell.text_content().strip()
+        if text.isdigit():
+            return int(text)
+    return None
+
+def _group_anchors(html):
+    """[[link text, href, member count or None]] for every 集團股 link on the index page."""
+    doc = lxml_html.fromstring(html)
+    return [
+        [a.text_content().strip(), a.get("href", ""), _group_member_count(a)]
+        for a in doc.xpath(f"//a[contains(@href, '{GOODINFO_GROUP_CAT}')]")
+    ]
+
+def _group_links_from_anchors(anchors):
+    groups = {}
+    for text, href, count in anchors:
+        href = urljoin(GOODINFO_BASE_URL, href)
+        if "INDUSTRY_CAT" not in href or not text:
+            continue
+        m = re.match(r"^(.*?)\s*\((\d+)\)$", text)   # "台積電集團 (12)"
+        if m:
+            text, count = m.group(1), int(m.group(2))
+        if (text, href) not in groups or groups[(text, href)] is None:
+            groups[(text, href)] = count
+    return sorted((name, href, count) for (name, href), count in groups.items())
+
+def parse_group_links(html):
+    """
+    Parses the 集團股 index page.
+    Returns: sorted [(group_name, absolute_href, member_count or None)]
+    """
+    return _group_links_from_anchors(_group_anchors(html))
+
+def _member_hrefs(html):
+    """hrefs of the member StockDetail links on a single group page."""
+    doc = lxml_html.fromstring(html)
+    # Try specific table first, fall back to all stock links on page
+    stock_links = doc.xpath("//table[@id='tblStockList']//a[contains(@href, 'StockDetail.asp?STOCK_ID=')]")
+    if not stock_links:
+        stock_links = doc.xpath("//div[@id='divStockList']//a[contains(@href, 'StockDetail.asp?STOCK_ID=')]")
+    if not stock_links:
+        # Broadest fallback — may include sidebar links, deduplication handles it
+        stock_links = doc.xpath("//a[contains(@href, 'StockDetail.asp?STOCK_ID=')]")
+    return [sl.get("href", "") for sl in stock_links]
+
+def _members_from_hrefs(hrefs):
+    members = []
+    for shref in hrefs:
+        if "STOCK_ID=" in shref:
+            sid = shref.split("STOCK_ID=")[1].split("&")[0]
+            if sid not in members:
+                members.append(sid)
+    return members
+
+def parse_group_members(html):
+    """Returns the stock IDs listed on a single group page."""
+    return _members_from_hrefs(_member_hrefs(html))
+
+def load_group_index(path=GROUP_INDEX_PATH):
+    """Loads the persisted group -> members index (empty index if missing/corrupt)."""
+    empty = {"crawled_at": 0, "groups": {}}
+    if not os.path.exists(path):
+        return empty
     try:
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
-        # Set a strict page load timeout (30 seconds) to prevent hanging
-        driver.set_page_load_timeout(30)
-        return driver
+        with open(path, encoding="utf-8") as f:
+            index = json.load(f)
+        index.setdefault("crawled_at", 0)
+        index.setdefault("groups", {})
+        return index
     except Exception as e:
-        print(f"Failed to initialize Selenium: {e}")
-        return None
+        print(f"Warning: Could not load group index {path}: {e}")
+        return empty
+
+def save_group_index(index, path=GROUP_INDEX_PATH):
+    dirname = os.path.dirname(path)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+def group_index_to_map(index):
+    """{StockID: "GroupA, GroupB"} — each stock's groups as a sorted, de-duplicated set."""
+    memberships = {}
+    for group_name, entry in index["groups"].items():
+        for sid in entry.get("members", []):
+            memberships.setdefault(sid, set()).add(group_name)
+    return {sid: ", ".join(sorted(names)) for sid, names in memberships.items()}
+
+def refresh_group_index(drivers, index, cache=None, refresh=False, now=None, deadline=None):
+    """
+    Updates `index` in place from the 集團股 index page.
+    A group is re-crawled only if it is new, its listed member count changed,
+    its href changed, or its members are older than GROUP_RECRAWL_MAX_AGE.
+    Groups no longer listed are dropped. Crawls run concurrently on the driver pool
+    until `deadline` (a Deadline) expires; the index then keeps its old crawl time,
+    so the next run picks up the groups left over.
+    Returns True if the index page could be read.
+    """
+    now = now or time.time()
+    driver = next((d for d in drivers if d is not None), None)
+    try:
+        listing = _load_goodinfo_list_page(
+            driver, GOODINFO_GROUP_LIST_URL, "group_list",
+            f"a[href*='{GOODINFO_GROUP_CAT}']", cache,
+        )
+    except Exception as e:
+        print(f"Timeout or error loading Group List page: {e}")
+        return False
+    if listing is None:
+        print("Group List page could not be loaded (not cached, no driver, or no groups listed).")
+        return False
+
+    if not listing:
+        print("No groups found on Group List page.")
+        return False
+
+    old_groups = index["groups"]
+    to_crawl = []
+    for group_name, href, count in listing:
+        entry = old_groups.get(group_name)
+        if (
+            refresh
+            or entry is None
+            or entry.get("href") != href
+            or (count is not None and entry.get("count") != count)
+            or now - entry.get("crawled_at", 0) > GROUP_RECRAWL_MAX_AGE
+        ):
+            to_crawl.append((group_name, href, count))
+
+    listed = {name for name, _, _ in listing}
+    dropped = sorted(set(old_groups) - listed)
+    print(f"Found {len(listing)} unique groups: {len(to_crawl)} to crawl, "
+          f"{len(listing) - len(to_crawl)} unchanged, {len(dropped)} dropped.")
+
+    def _crawl(drv, item):
+        group_name, href, _ = item
+        return _load_goodinfo_list_page(drv, href, "group", "td", cache)
+
+    crawled = run_on_driver_pool(
+        drivers or [None], to_crawl, _crawl, deadline=deadline,
+        describe=lambda item: f"Mapping Group: {item[0]}",
+    )
 
-def get_goodinfo_group_map(driver):
+    groups = {name: old_groups[name] for name, _, _ in listing if name in old_groups}
+    for group_name, href, count in to_crawl:
+        members = crawled.get((group_name, href, count))
+        if members is None:
+            continue   # crawl failed — keep the previous members, if any
+        groups[group_name] = {"href": href, "count": count, "members": members, "crawled_at": now}
+
+    index["groups"] = groups
+    if deadline is None or not deadline.expired:
+        index["crawled_at"] = now
+    return True
+
+def get_goodinfo_group_map(drivers, cache=None, index_path=GROUP_INDEX_PATH,
+                           refresh=False, deadline=None):
     """
     Fetches the mapping of Stock ID -> Group Name from GoodInfo's Group List page.
     This is much more efficient than visiting every stock page.
+    The group -> members index is persisted at `index_path`; within GROUP_INDEX_TTL
+    it is used as-is, otherwise only changed groups are re-crawled.
+    Returns: ({ 'StockID': 'GroupA, GroupB' }, index crawl time as epoch seconds)
     """
-    if driver is None:
-        return {}
-        
-    print("Fetching GoodInfo Group Map...")
-    group_map = {}
-    
-    try:
-        # 1. Get list of all groups
-        url_all_groups = "https://goodinfo.tw/tw/StockList.asp?MARKET_CAT=%E9%9B%86%E5%9C%98%E8%82%A1&SHEET=%E8%82%A1%E7%A5%A8%E6%B8%85%E5%96%AE"
-        try:
-            driver.get(url_all_groups)
-        except Exception as e:
-            print(f"Timeout or error loading Group List page: {e}")
-            return {} # Abort if main list fails
-        
-        # Wait for links to appear
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.XPATH, "//a[contains(@href, 'MARKET_CAT=%E9%9B%86%E5%9C%98%E8%82%A1')]"))
-        )
-        
-        links = driver.find_elements(By.XPATH, "//a[contains(@href, 'MARKET_CAT=%E9%9B%86%E5%9C%98%E8%82%A1')]")
-        
-        group_links = set()
-        for link in links:
-            href = link.get_attribute('href')
-            text = link.text.strip()
-            if "INDUSTRY_CAT" in href and text:
-                group_links.add((text, href))
-        
-        print(f"Found {len(group_links)} unique groups. Mapping stocks...")
-        
-        # 2. Iterate ALL groups
-        total_groups = len(group_links)
-        for i, (group_name, href) in enumerate(group_links):
-            print(f"  [{i+1}/{total_groups}] Mapping Group: {group_name}")
+    index = load_group_index(index_path)
+    age = time.time() - index["crawled_at"]
+
+    if refresh or not index["groups"] or age > GROUP_INDEX_TTL:
+        if not any(d is not None for d in drivers) and cache is None:
+            print("Skipping group crawl (no driver or cache) — using persisted group index.")
+        else:
+            print("Fetching GoodInfo Group Map...")
             try:
-                driver.get(href)
-                # Wait for table content to load (replaces bare sleep)
-                try:
-                    WebDriverWait(driver, 15).until(
-                        EC.presence_of_element_located((By.TAG_NAME, "td"))
-                    )
-                except:
-                    time.sleep(2)
-
-                # Try specific table first, fall back to all stock links on page
-                stock_links = driver.find_elements(By.XPATH, "//table[@id='tblStockList']//a[contains(@href, 'StockDetail.asp?STOCK_ID=')]")
-                if not stock_links:
-                    stock_links = driver.find_elements(By.XPATH, "//div[@id='divStockList']//a[contains(@href, 'StockDetail.asp?STOCK_ID=')]")
-                if not stock_links:
-                    # Broadest fallback — may include sidebar links, deduplication handles it
-                    stock_links = driver.find_elements(By.XPATH, "//a[contains(@href, 'StockDetail.asp?STOCK_ID=')]")
-                
-                for sl in stock_links:
-                    shref = sl.get_attribute('href')
-                    if "STOCK_ID=" in shref:
-                        try:
-                            sid = shref.split("STOCK_ID=")[1].split("&")[0]
-                            if sid in group_map:
-                                if group_name not in group_map[sid]:
-                                    group_map[sid] += f", {group_name}"
-                            else:
-                                group_map[sid] = group_name
-                        except:
-                            pass
+                if refresh_group_index(drivers, index, cache=cache, refresh=refresh, deadline=deadline):
+                    save_group_index(index, index_path)
             except Exception as e:
-                print(f"  Skipping group {group_name} due to error: {e}")
-                continue
-                        
-    except Exception as e:
-        print(f"Error fetching group map: {e}")
-        
-    print(f"Mapped {len(group_map)} stocks to groups.")
-    return group_map
+                print(f"Error fetching group map: {e}")
+    else:
+        print(f"Using persisted group index ({len(index['groups'])} groups, {age / 3600:.1f}h old).")
 
-def _process_llm_batch(client, stock_chunk, max_retries=5):
-    """Helper to process a single batch of stocks with LLM client."""
-    results = {}
-    # Format list for prompt
-    stock_text = "\n".join([f"{s[0]} {s[1]}" for s in stock_chunk])
+    group_map = group_index_to_map(index)
+    print(f"Mapped {len(group_map)} stocks to groups.")
+    return group_map, index["crawled_at"]
 
-    prompt = f"""
+CONCEPT_PROMPT_TEMPLATE = """
     You are a financial analyst specializing in Taiwan tech stocks.
     Analyze the following list of companies.
 
@@ -424,166 +921,783 @@ def _process_llm_batch(client, stock_chunk, max_retries=5):
     Stocks:
     {stock_text}
     """
-
-    for attempt in range(max_retries):
+# Part of every LLM cache key: editing the prompt invalidates cached answers
+CONCEPT_PROMPT_VERSION = hashlib.sha1(CONCEPT_PROMPT_TEMPLATE.encode("utf-8")).hexdigest()[:12]
+# Provider route used for the concept prompt; set COMPANYINFO_LLM_MODEL when switching models
+LLM_MODEL_KEY = os.getenv("COMPANYINFO_LLM_MODEL", "generate_smart/codex")
+
+# Concurrent LLM batches: one worker per API key slot (GEMINI_API_KEY_1..10)
+LLM_KEY_ENV = "GEMINI_API_KEY"
+LLM_MAX_KEYS = 10
+LLM_MAX_ATTEMPTS = 5    # per batch, across all key slots
+_LLM_ENV_LOCK = threading.Lock()
+
+# Batches are packed up to a token budget (prompt + expected reply) instead of a fixed size
+LLM_TOKEN_BUDGET = 1600
+LLM_REPLY_TOKENS_PER_STOCK = 24    # one "2330, Nvidia;Apple;..." reply line
+
+class LLMThrottled(Exception):
+    """The key slot is overloaded / rate limited; the batch should go to another slot."""
+
+def llm_api_keys():
+    """Distinct non-empty GEMINI_API_KEY_1..10 values, in slot order."""
+    keys = [os.getenv(f"{LLM_KEY_ENV}_{i}") for i in range(1, LLM_MAX_KEYS + 1)]
+    return [k for k in dict.fromkeys(keys) if k]
+
+def llm_available():
+    """True if the LLM SDK is installed and a GEMINI_API_KEY (or GEMINI_API_KEY_n) is set."""
+    return LLM_AVAILABLE and bool(os.getenv(LLM_KEY_ENV) or llm_api_keys())
+
+def _new_llm_client(api_key=None):
+    """
+    LLMClient bound to `api_key`. The SDK reads GEMINI_API_KEY when the client is
+    created, so the variable is swapped in for the construction only.
+    api_key=None uses the SDK's default key lookup.
+    """
+    if api_key is None:
+        return LLMClient(app_name="CompanyInfo")
+    with _LLM_ENV_LOCK:
+        saved = os.environ.get(LLM_KEY_ENV)
+        os.environ[LLM_KEY_ENV] = api_key
         try:
-            # 啟用智慧路由：先嘗試透過伺服器端 (Codex/Gemini-CLI) 產生草稿並評審，若已晉升則直接回傳
-            text = client.generate_smart("CompanyInfo_ConceptStock", prompt, draft_provider="codex")
+            return LLMClient(app_name="CompanyInfo")
+        finally:
+            if saved is None:
+                del os.environ[LLM_KEY_ENV]
+            else:
+                os.environ[LLM_KEY_ENV] = saved
 
-            if text.startswith("```"): # Cleanup markdown
-                text = text.strip("`").replace("csv\n", "", 1)
+def estimate_tokens(text):
+    """Rough token count: ~1 token per CJK character, ~4 ASCII characters per token."""
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii + 3) // 4
 
-            lines = text.strip().split('\n')
-            for line in lines:
-                parts = line.split(',', 1)
-                if len(parts) == 2:
-                    sid = parts[0].strip()
-                    # Replace any remaining commas with semicolons
-                    concepts = parts[1].strip().replace(',', ';')
+def _llm_stock_line(stock):
+    return f"{stock[0]} {stock[1]}"
 
-                    # Basic validation
-                    if concepts.lower() != "none" and sid.isdigit():
-                        results[sid] = concepts
+def pack_llm_batches(stock_list, budget=LLM_TOKEN_BUDGET):
+    """
+    Splits stock_list into batches whose estimated prompt + reply tokens stay within
+    `budget`. A single stock that exceeds the budget on its own still gets a batch.
+    """
+    overhead = estimate_tokens(CONCEPT_PROMPT_TEMPLATE.format(stock_text=""))
+    batches, current, used = [], [], overhead
+    for stock in stock_list:
+        cost = estimate_tokens(_llm_stock_line(stock)) + 1 + LLM_REPLY_TOKENS_PER_STOCK
+        if current and used + cost > budget:
+            batches.append(current)
+            current, used = [], overhead
+        current.append(stock)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+def _call_with_timeout(timeout, func, *args, **kwargs):
+    """
+    func(*args, **kwargs), giving up after `timeout` seconds (None waits for ever).
+    A call that overruns is left to finish on its daemon thread; its result is dropped.
+    Raises TimeoutError when it overruns.
+    """
+    if timeout is None:
+        return func(*args, **kwargs)
+    outcome = {}
 
-            # Success - wait before next request
-            time.sleep(3)
-            return results
+    def _call():
+        try:
+            outcome["value"] = func(*args, **kwargs)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=_call, daemon=True)
+    thread.start()
+    thread.join(max(0.0, timeout))
+    if thread.is_alive():
+        raise TimeoutError(f"no reply within {timeout:.0f}s")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["value"]
+
+def _process_llm_batch(client, stock_chunk, limiter=None, timeout=None):
+    """
+    Helper to process a single batch of stocks with LLM client (one attempt).
+    Returns { 'StockID': 'Concepts' } for every stock of the batch the LLM answered,
+    with "" for stocks it reported as not related; None on a non-retryable error,
+    or when no reply came within `timeout` seconds (waiting on the limiter included).
+    Raises LLMThrottled on overload / rate-limit errors.
+    """
+    results = {}
+    wanted = {str(s[0]) for s in stock_chunk}
+    # Format list for prompt
+    stock_text = "\n".join(_llm_stock_line(s) for s in stock_chunk)
 
-        except Exception as e:
-            error_str = str(e)
-            # Check if it's a 503 (overloaded) or rate limit error
-            if '503' in error_str or 'overloaded' in error_str.lower() or 'rate' in error_str.lower():
-                if attempt < max_retries - 1:
-                    wait_time = (2 ** attempt) * 3  # Exponential backoff: 3, 6, 12, 24, 48 seconds
-                    print(f"  LLM API overloaded/rate limited, retrying in {wait_time}s... (attempt {attempt + 1}/{max_retries})")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    print(f"  LLM API Error after {max_retries} attempts: {e}")
-            else:
-                # Non-retryable error
-                print(f"  LLM API Error: {e}")
-                break
+    prompt = CONCEPT_PROMPT_TEMPLATE.format(stock_text=stock_text)
 
+    limiter = limiter or RATE_LIMITER.host("llm")
+    started = time.monotonic()
+    if not limiter.acquire(timeout):
+        print("  LLM: out of time waiting for the rate limiter, batch not sent")
+        return None
+    if timeout is not None:
+        timeout -= time.monotonic() - started
+    try:
+        # 啟用智慧路由：先嘗試透過伺服器端 (Codex/Gemini-CLI) 產生草稿並評審，若已晉升則直接回傳
+        text = _call_with_timeout(
+            timeout, client.generate_smart, "CompanyInfo_ConceptStock", prompt, draft_provider="codex",
+        )
+
+        if text.startswith("```"): # Cleanup markdown
+            text = text.strip("`").replace("csv\n", "", 1)
+
+        lines = text.strip().split('\n')
+        for line in lines:
+            parts = line.split(',', 1)
+            if len(parts) == 2:
+                sid = parts[0].strip()
+                # Replace any remaining commas with semicolons
+                concepts = parts[1].strip().replace(',', ';')
+
+                # Basic validation
+                if sid.isdigit() and sid in wanted:
+                    results[sid] = "" if concepts.lower() == "none" else concepts
+    except TimeoutError as e:
+        print(f"  LLM API Error: {e}, batch dropped")
+        return None
+    except Exception as e:
+        error_str = str(e)
+        # Check if it's a 503 (overloaded) or rate limit error
+        if '503' in error_str or 'overloaded' in error_str.lower() or 'rate' in error_str.lower():
+            # The limiter backs this slot off exponentially (with jitter) before its next acquire()
+            limiter.failure("overloaded/rate limited")
+            raise LLMThrottled(error_str)
+        # Non-retryable error
+        print(f"  LLM API Error: {e}")
+        return None
+
+    limiter.success()
     return results
 
-def fetch_llm_concepts(stock_list):
+def run_llm_batches(slots, batches, on_result=None, deadline=None):
+    """
+    Runs every batch through `slots` ([(label, client, limiter)]) concurrently, one
+    worker thread per slot pulling from a shared queue. A throttled slot puts its
+    batch back for an idle slot and backs off on its own limiter. When a reply is
+    truncated or only partly parsed, just the missing stocks are split in two and
+    queued again.
+    on_result(batch, results) is called as each batch finishes.
+    Once `deadline` (a Deadline) expires, batches not sent yet are left out, and a
+    call still waiting for its reply then is abandoned.
+    Returns { 'StockID': 'Concepts' } for every answered stock.
+    """
+    work = queue.Queue()
+    for batch in batches:
+        work.put((batch, 1))
+    answered = {}
+    lock = threading.Lock()
+    counter = {"calls": 0, "requeued": 0, "past_deadline": 0}
+
+    def _run(label, client, limiter, batch, attempt):
+        if deadline is not None and deadline.expired:
+            with lock:
+                counter["past_deadline"] += len(batch)
+            return
+        with lock:
+            counter["calls"] += 1
+        print(f"  [{label}] Sending batch of {len(batch)} stocks to LLM (attempt {attempt})...")
+        timeout = deadline.remaining() if deadline is not None and deadline.seconds is not None else None
+        try:
+            results = _process_llm_batch(client, batch, limiter, timeout=timeout)
+        except LLMThrottled as e:
+            if attempt < LLM_MAX_ATTEMPTS:
+                print(f"  [{label}] Throttled, handing the batch to another key (attempt {attempt}/{LLM_MAX_ATTEMPTS})")
+                work.put((batch, attempt + 1))
+            else:
+                print(f"  LLM API Error after {LLM_MAX_ATTEMPTS} attempts: {e}")
+            return
+
+        if results is None:
+            if deadline is not None and deadline.expired:
+                with lock:
+                    counter["past_deadline"] += len(batch)
+            return
+        if on_result is not None:
+            on_result(batch, results)
+        with lock:
+            answered.update(results)
+        missing = [s for s in batch if str(s[0]) not in results]
+        if missing and attempt < LLM_MAX_ATTEMPTS:
+            print(f"  [{label}] {len(missing)}/{len(batch)} stocks missing from the reply, retrying just those")
+            half = (len(missing) + 1) // 2
+            for part in (missing[:half], missing[half:]):
+                if part:
+                    work.put((part, attempt + 1))
+                    with lock:
+                        counter["requeued"] += 1
+        elif missing:
+            print(f"  Giving up on {len(missing)} stocks the LLM never answered: "
+                  f"{', '.join(str(s[0]) for s in missing[:10])}")
+
+    def _worker(label, client, limiter):
+        while True:
+            item = work.get()
+            if item is None:
+                work.task_done()
+                return
+            batch, attempt = item
+            try:
+                _run(label, client, limiter, batch, attempt)
+            except Exception as e:
+                # Never leave the queue unjoinable: drop the batch, its rows stay unfilled
+                print(f"  [{label}] Dropping batch of {len(batch)} stocks "
+                      f"({', '.join(str(s[0]) for s in batch[:10])}): {e}")
+            finally:
+                work.task_done()
+
+    threads = [
+        threading.Thread(target=_worker, args=slot, daemon=True)
+        for slot in slots
+    ]
+    for t in threads:
+        t.start()
+    work.join()
+    for _ in threads:
+        work.put(None)
+    for t in threads:
+        t.join()
+    print(f"LLM calls: {counter['calls']} ({len(batches)} batches, {counter['requeued']} retry splits).")
+    if counter["past_deadline"]:
+        print(f"Deadline reached: {counter['past_deadline']} stocks left for the LLM on the next run.")
+    return answered
+
+def fetch_llm_concepts(stock_list, journal=None, cache=None, business=None, workers=None,
+                       token_budget=LLM_TOKEN_BUDGET, client_factory=None, deadline=None):
     """
     Uses LLM client to identify concept stocks for specific tech giants.
     stock_list: list of tuples (id, name)
+    Stocks with a fresh answer in `cache` (an LLMConceptCache, keyed together with
+    `business`: { 'StockID': 主要業務 }) are not sent; new answers are stored.
+    Batches are packed up to `token_budget` estimated tokens and run concurrently,
+    one worker per GEMINI_API_KEY_n (at most `workers`).
+    client_factory(api_key) replaces LLMClient (e.g. llm_standin.StandInLLMClient).
+    Each finished batch is appended to `journal`, if given. No batch is sent
+    once `deadline` (a Deadline) has expired.
     Returns: dict { 'StockID': 'Concepts' }
     """
-    if not LLM_AVAILABLE:
-        print("Skipping LLM analysis (llm SDK not found).")
-        return {}
+    business = business or {}
+    answered = {}
+    if cache is not None:
+        pending = []
+        for sid, name in stock_list:
+            concepts = cache.get(sid, name, business.get(str(sid)))
+            if concepts is None:
+                pending.append((sid, name))
+            else:
+                answered[str(sid)] = concepts
+        print(f"LLM cache: {len(answered)} stocks answered from cache, {len(pending)} to send.")
+        stock_list = pending
+
+    if not stock_list:
+        return {sid: c for sid, c in answered.items() if c}
+    if client_factory is None:
+        if not llm_available():
+            print("Skipping LLM analysis (llm SDK not found or no GEMINI_API_KEY set).")
+            return {sid: c for sid, c in answered.items() if c}
+        client_factory = _new_llm_client
 
     print("Initializing LLM Client...")
     try:
-        # 使用預設 Provider 鏈 (codex -> gemini -> mlx)
-        client = LLMClient(app_name="CompanyInfo")
+        # 使用預設 Provider 鏈 (codex -> gemini -> mlx); one client and limiter per API key
+        keys = llm_api_keys()[:workers] if workers else llm_api_keys()
+        slots = []
+        for n, key in enumerate(keys or [None], start=1):
+            label = f"llm-key{n}" if key else "llm"
+            if key:
+                RATE_LIMITER.configure(label, **RATE_LIMITER.settings["llm"])
+            slots.append((label, client_factory(key), RATE_LIMITER.host(label)))
+
+        # Pack batches to the token budget to avoid context limits
+        batches = pack_llm_batches(stock_list, token_budget)
+        print(f"LLM batches: {len(batches)} for {len(stock_list)} stocks "
+              f"(~{len(stock_list) / len(batches):.0f} per batch, budget {token_budget} tokens).")
+        names = {str(sid): name for sid, name in stock_list}
+
+        def _record(batch, batch_results):
+            if journal is not None:
+                # Only answered stocks count as done; missing ones are retried (or resumed)
+                journal.record("llm_batch", stock_ids=list(batch_results), results=batch_results)
+            if cache is not None:
+                for sid, concepts in batch_results.items():
+                    if sid in names:
+                        cache.put(sid, names[sid], business.get(sid), concepts)
+
+        started = time.perf_counter()
+        fetched = run_llm_batches(slots, batches, on_result=_record, deadline=deadline)
+        print(f"LLM stage: {len(batches)} batches over {len(slots)} key slot(s) in {time.perf_counter() - started:.1f}s.")
+
+        # Each stock is answered by exactly one call, so completion order does not matter
+        all_results = {**answered, **fetched}
+        return {sid: c for sid, c in all_results.items() if c}
+    except Exception as e:
+        print(f"Failed to init LLM Client: {e}")
+        return {sid: c for sid, c in answered.items() if c}
 
-        # Process in chunks to avoid context limits
-        chunk_size = 40
-        all_results = {}
+# StockDetail.asp fields and the label cells they can appear under, in priority order
+DETAIL_FIELD_LABELS = {
+    "主要業務": ("主要業務",),
+    "相關概念": ("相關概念",),
+    "市值": ("市值", "目前市值", "總市值"),
+}
+# Fields whose value sits in a <p> after the label rather than the next <td>
+DETAIL_PARAGRAPH_FIELDS = {"主要業務"}
 
-        total_chunks = (len(stock_list) + chunk_size - 1) // chunk_size
+# What may follow a label inside its cell: "市值 (億)</nobr>", "主要業務</td>", ...
+_LABEL_TAIL_RE = re.compile(r"\s*(?:\([^<]*\))?\s*</(?:nobr|td)>", re.IGNORECASE)
+_TD_VALUE_RE = re.compile(r"<td[^>]*>(.*?)</td>", re.DOTALL | re.IGNORECASE)
+_P_VALUE_RE = re.compile(r"<p\b[^>]*>(.*?)</p>", re.DOTALL | re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
 
-        for i in range(0, len(stock_list), chunk_size):
-            chunk = stock_list[i:i + chunk_size]
-            print(f"  Sending chunk {i//chunk_size + 1}/{total_chunks} to LLM...")
+def _clean_cell(raw):
+    return _TAG_RE.sub("", raw).strip().replace("&nbsp;", " ")
 
-            batch_results = _process_llm_batch(client, chunk)
-            all_results.update(batch_results)
+def _find_label_cell(html, label):
+    """
+    Anchored scan for a label cell (">label</td>", "<nobr>label (…)</nobr>").
+    Uses str.find to jump between occurrences, so text mentions of the label
+    elsewhere on the page are skipped cheaply. Returns the offset after the cell tag.
+    """
+    pos = html.find(label)
+    while pos != -1:
+        before = pos - 1
+        while before >= 0 and html[before].isspace():
+            before -= 1
+        if before >= 0 and html[before] == ">":
+            m = _LABEL_TAIL_RE.match(html, pos + len(label))
+            if m:
+                return m.end()
+        pos = html.find(label, pos + len(label))
+    return None
+
+def extract_detail_fields(html):
+    """
+    Extracts every field registered in DETAIL_FIELD_LABELS from one page.
+    Each label cell is located by an anchored scan and its value is read from
+    the cell right after it; no pattern ever re-scans the page from the start.
+    Returns: dict { field: value or None }
+    """
+    fields = {}
+    for field, labels in DETAIL_FIELD_LABELS.items():
+        value = None
+        for label in labels:
+            pos = _find_label_cell(html, label)
+            if pos is None:
+                continue
+            m = None
+            if field in DETAIL_PARAGRAPH_FIELDS:
+                m = _P_VALUE_RE.search(html, pos)
+            if m is None:
+                m = _TD_VALUE_RE.search(html, pos)
+            if m is not None:
+                value = _clean_cell(m.group(1))
+                if value:
+                    break
+        fields[field] = value
+    return fields
+
+def _detail_tuple(fields):
+    # Group is now handled globally, removed from here
+    return fields["主要業務"], fields["相關概念"], fields["市值"]
+
+def parse_goodinfo_detail(html):
+    """
+    Extracts fields from a StockDetail page.
+    Returns: (main_biz, concepts, market_cap)
+    """
+    return _detail_tuple(extract_detail_fields(html))
 
-        return all_results
-    except Exception as e:
-        print(f"Failed to init LLM Client: {e}")
-        return {}
-def fetch_goodinfo_data(driver, stock_id, max_retries=2):
-    if driver is None:
-        return None, None, None
+_NO_DETAIL = (None, None, None)
+
+def load_goodinfo_detail(driver, stock_id, max_retries=2, cache=None, stats=None, http=True, parse=True):
+    """
+    Load stage of one StockDetail page. Returns (outcome, page); the outcome is one
+    of the PAGE_* codes (see classify_page()) and page is None unless it is PAGE_OK:
+    { data, source, cacheable } with source "cache", "http" or "browser".
+    A fresh cached page is used without touching the driver. Otherwise the page is
+    fetched over plain HTTP with the browser's cookies when possible (http=True),
+    else loaded in the browser through the goodinfo.tw rate limiter, its fields
+    extracted in the browser (one execute_script) and measured into `stats`.
+    A page fetched over HTTP also carries its "html" (cached in place of the data).
+    parse=False hands such a page back unparsed (data None, outcome None) so that
+    finish_goodinfo_page() can parse it off the driver's thread.
+    A block, challenge or empty page is retried as soon as it is recognised (after
+    the limiter's back-off; a challenge with the driver's cookies cleared); a stock
+    GoodInfo does not list is not retried.
+    """
+    url = GOODINFO_DETAIL_URL.format(stock_id=stock_id)
 
-    url = f"https://goodinfo.tw/tw/StockDetail.asp?STOCK_ID={stock_id}"
+    if cache is not None:
+        fields = _cached_page_data(cache, url, "detail")
+        if fields is not None:
+            return PAGE_OK, {"data": fields, "source": "cache", "cacheable": False}
 
+    if http:
+        outcome, page = _fetch_goodinfo_http(url, "detail", parse=parse)
+        if outcome == PAGE_OK or (outcome is None and page is not None):
+            return outcome, page
+        if outcome == PAGE_NOT_FOUND:
+            return outcome, None
+
+    if driver is None:
+        return PAGE_ERROR, None
+
+    limiter = RATE_LIMITER.host(url)
+    outcome = PAGE_ERROR
     for attempt in range(max_retries):
+        retry = attempt < max_retries - 1
         try:
             try:
+                limiter.acquire()
+                load_started = time.monotonic()
+                commands_before = getattr(driver, "command_count", 0)
                 driver.get(url)
             except Exception as e:
-                if attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * 5  # 5, 10, 15 seconds
-                    print(f"  Timeout loading page for {stock_id}, retrying in {wait_time}s... (attempt {attempt + 1}/{max_retries})")
-                    time.sleep(wait_time)
+                limiter.failure("timeout")
+                outcome = PAGE_ERROR
+                if retry:
+                    print(f"  Timeout loading page for {stock_id}, retrying... (attempt {attempt + 1}/{max_retries})")
                     continue
                 else:
                     print(f"  Final timeout/error loading page for {stock_id}: {e}")
-                    return None, None, None
+                    return outcome, None
+
+            # Returns once the "Initializing" challenge has passed and content is there,
+            # or as soon as the page is recognisably a block / not-found page
+            settled = _wait_for_page(driver, "td")
+
+            page = _extract_page(driver, "detail", commands_before)
+            seconds = time.monotonic() - load_started
+            if stats is not None:
+                stats.record(stock_id, seconds, *page["transfer"])
+
+            outcome = PAGE_OUTCOMES.record("detail", "browser", classify_page("detail", page))
+            _settle_limiter(limiter, outcome)
+            if outcome == PAGE_OK:
+                if not GOODINFO_HTTP.ready:
+                    GOODINFO_HTTP.adopt_browser_session(driver)
+                return outcome, {
+                    "data": page["data"], "html": page.get("html"),
+                    "source": "browser", "cacheable": settled == "ready",
+                }
+            if outcome == PAGE_NOT_FOUND:
+                print(f"  {stock_id}: not listed on GoodInfo, skipping.")
+                return outcome, None
+            if outcome == PAGE_CHALLENGE:
+                # Still challenged after the wait: start the challenge over from scratch
+                driver.delete_all_cookies()
+            if retry:
+                print(f"  {stock_id}: {outcome} page after {seconds:.1f}s, retrying... (attempt {attempt + 1}/{max_retries})")
+                continue
+            return outcome, None
+
+        except Exception as e:
+            limiter.failure("error")
+            outcome = PAGE_ERROR
+            if retry:
+                print(f"  Error fetching GoodInfo for {stock_id}, retrying... (attempt {attempt + 1}/{max_retries}): {e}")
+                continue
+            else:
+                print(f"  Final error fetching GoodInfo for {stock_id}: {e}")
+                return outcome, None
 
-            # Wait for the "Initializing" to pass and content to load
-            wait = WebDriverWait(driver, 20)
-            wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+    return outcome, None
 
+def _store_detail_page(cache, stock_id, page):
+    if cache is not None and page.get("cacheable"):
+        _cache_page_data(cache, GOODINFO_DETAIL_URL.format(stock_id=stock_id), "detail", page)
+
+def fetch_goodinfo_data(driver, stock_id, max_retries=2, cache=None, stats=None):
+    """
+    Returns (outcome, (main_biz, concepts, market_cap)) for one stock, loaded (see
+    load_goodinfo_detail()), parsed and cached in one go. The fields are all None
+    unless the outcome is PAGE_OK.
+    """
+    outcome, page = load_goodinfo_detail(driver, stock_id, max_retries, cache=cache, stats=stats)
+    if outcome != PAGE_OK:
+        return outcome, _NO_DETAIL
+    _store_detail_page(cache, stock_id, page)
+    return outcome, _detail_tuple(page["data"])
+
+class PageLoadStats:
+    """Page-load time and bytes transferred per StockDetail page, summarised per run."""
+    def __init__(self, profile):
+        self.profile = profile
+        self._lock = threading.Lock()
+        self._pages = []   # (stock_id, seconds, bytes, requests)
+
+    def record(self, stock_id, seconds, transferred, requests_made):
+        """
+        transferred / requests_made: bytes over the navigation and every resource entry
+        (from the extraction script). Cross-origin entries without Timing-Allow-Origin
+        report 0, so this is a lower bound.
+        """
+        with self._lock:
+            self._pages.append((stock_id, seconds, int(transferred or 0), int(requests_made or 0)))
+        print(f"  {stock_id}: loaded in {seconds:.2f}s, {int(transferred or 0) / 1024:.0f} KB over {requests_made} requests")
+
+    def report(self):
+        if not self._pages:
+            return
+        seconds = [p[1] for p in self._pages]
+        kbytes = [p[2] / 1024 for p in self._pages]
+        print(f"Page loads ({self.profile} profile): {len(self._pages)} pages, "
+              f"mean {sum(seconds) / len(seconds):.2f}s, max {max(seconds):.2f}s, "
+              f"mean {sum(kbytes) / len(kbytes):.0f} KB/page, total {sum(kbytes) / 1024:.1f} MB")
+
+class CircuitBreaker:
+    """
+    Pool-wide replacement for the old `consecutive_failures` counter.
+    Any worker's success resets it; once tripped, every worker stops taking work.
+    """
+    def __init__(self, threshold=CIRCUIT_BREAKER_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._tripped = threading.Event()
+
+    @property
+    def tripped(self):
+        return self._tripped.is_set()
+
+    def record(self, ok):
+        with self._lock:
+            if ok:
+                self._consecutive = 0
+            else:
+                self._consecutive += 1
+                if self._consecutive >= self.threshold and not self._tripped.is_set():
+                    print("Too many consecutive failures (IP blocked?). Stopping GoodInfo scrape.")
+                    self._tripped.set()
+
+class Deadline:
+    """
+    Wall-clock budget of a run (--deadline). `expired` turns True `reserve` seconds
+    before the budget is used up, leaving that long to wrap up. No budget never expires.
+    """
+    def __init__(self, seconds=None, reserve=0.0, started=None):
+        self.seconds = seconds
+        self.reserve = reserve
+        self.started = time.monotonic() if started is None else started
+
+    def remaining(self):
+        if self.seconds is None:
+            return float("inf")
+        return self.started + self.seconds - self.reserve - time.monotonic()
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+def run_deadlines(budget, reserve, started=None):
+    """
+    (scrape deadline, final deadline) for a `budget` of seconds (None: no budget).
+    Scraping stops `reserve` seconds early, the LLM stage DEADLINE_OUTPUT_MARGIN early;
+    both are capped at a share of the budget, so a short budget still leaves time to work.
+    """
+    started = time.monotonic() if started is None else started
+    if budget is None:
+        return Deadline(started=started), Deadline(started=started)
+    margin = min(DEADLINE_OUTPUT_MARGIN, budget * DEADLINE_OUTPUT_MAX_SHARE)
+    reserve = max(min(reserve, budget * DEADLINE_RESERVE_MAX_SHARE), margin)
+    return (Deadline(budget, reserve=reserve, started=started),
+            Deadline(budget, reserve=margin, started=started))
+
+def start_driver_pool(size, profile="scrape", max_pages=DEFAULT_MAX_PAGES, max_rss_mb=DEFAULT_MAX_RSS_MB):
+    """
+    Starts up to `size` managed Selenium drivers concurrently (see driver_manager.py;
+    each is recycled after `max_pages` page loads or past `max_rss_mb`). Returns the
+    ones that came up.
+    """
+    if not SELENIUM_AVAILABLE or size < 1:
+        return []
+
+    drivers = [None] * size
+
+    def _start(slot):
+        drivers[slot] = ManagedDriver(
+            lambda: get_selenium_driver(profile), f"driver-{slot + 1}",
+            max_pages=max_pages, max_rss_mb=max_rss_mb,
+        )
+
+    threads = [threading.Thread(target=_start, args=(i,), daemon=True) for i in range(size)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    alive = [d for d in drivers if d is not None and d.alive]
+    print(f"Driver pool ready: {len(alive)}/{size} drivers.")
+    return alive
+
+def stop_driver_pool(drivers):
+    report_drivers(drivers)
+    for d in drivers:
+        try:
+            d.quit()
+        except Exception:
+            pass
+
+def run_on_driver_pool(drivers, items, handler, breaker=None, describe=None, deadline=None):
+    """
+    Runs handler(driver, item) for every item, one worker thread per driver,
+    taking items from a shared queue. `None` results count as failures for the
+    circuit breaker (only when a real driver did the work) and are left out,
+    as are SKIP_ITEM results. Workers stop taking items once `deadline` expires.
+    Returns: dict { item: result }
+    """
+    breaker = breaker or CircuitBreaker()
+    jobs = queue.Queue()
+    for pos, item in enumerate(items):
+        jobs.put((pos, item))
+
+    total = len(items)
+    results = {}
+    results_lock = threading.Lock()
+
+    def _worker(driver):
+        while not breaker.tripped and not (deadline is not None and deadline.expired):
             try:
-                wait.until(EC.presence_of_element_located((By.TAG_NAME, "td")))
-            except:
-                pass
-
-            html = driver.page_source
-
-            def extract(field_name):
-                # Case A: Special for Main Business (often in a <p>)
-                if field_name == "主要業務":
-                    # <nobr>主要業務</nobr>...<p...>(Value)</p>
-                    p_match = re.search(fr"<nobr>{field_name}</nobr>.*?<p[^>]*>(.*?)</p>", html, re.DOTALL | re.IGNORECASE)
-                    if p_match:
-                        return re.sub(r'<[^>]+>', '', p_match.group(1)).strip().replace('&nbsp;', ' ')
-
-                # General fallback
-                patterns = [
-                    fr"<nobr>{field_name}</nobr>.*?<td[^>]*>(.*?)</td>",
-                    fr">{field_name}</td>\s*<td[^>]*>(.*?)</td>",
-                    fr">{field_name}</nobr>.*?<td[^>]*>(.*?)</td>"
-                ]
-
-                for pat in patterns:
-                    m = re.search(pat, html, re.DOTALL | re.IGNORECASE)
-                    if m:
-                        return re.sub(r'<[^>]+>', '', m.group(1)).strip().replace('&nbsp;', ' ')
-                return None
+                pos, item = jobs.get_nowait()
+            except queue.Empty:
+                return
+            if describe is not None:
+                print(f"[{pos+1}/{total}] {describe(item)}")
+            try:
+                result = handler(driver, item)
+            except Exception as e:
+                print(f"  Skipping {item} due to error: {e}")
+                result = None
+            if driver is not None:
+                breaker.record(result is not None)
+            if result is not None and result is not SKIP_ITEM:
+                with results_lock:
+                    results[item] = result
+
+    threads = [threading.Thread(target=_worker, args=(d,), daemon=True) for d in drivers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
 
-            def extract_market_cap():
-                patterns = [
-                    r"<nobr>\s*市值(?:\s*\([^<]*\))?\s*</nobr>.*?<td[^>]*>(.*?)</td>",
-                    r">市值(?:\s*\([^<]*\))?</td>\s*<td[^>]*>(.*?)</td>",
-                    r">市值(?:\s*\([^<]*\))?</nobr>.*?<td[^>]*>(.*?)</td>"
-                ]
-                for pat in patterns:
-                    m = re.search(pat, html, re.DOTALL | re.IGNORECASE)
-                    if m:
-                        return re.sub(r'<[^>]+>', '', m.group(1)).strip().replace('&nbsp;', ' ')
-                return None
+def scrape_goodinfo_details(drivers, stock_list, breaker=None, cache=None, stats=None, journal=None,
+                            parse_workers=DEFAULT_PARSE_WORKERS, deadline=None):
+    """
+    Scrapes StockDetail pages through a ScrapePipeline (see scrape_pipeline.py): one
+    load worker per driver, `parse_workers` threads parsing the pages fetched over
+    HTTP, and one writer that caches each result and appends it to `journal` as soon
+    as it completes. An HTTP page that parses empty is reloaded in the browser.
+    A `None` driver only serves pages from the cache (cache-only mode).
+    stock_list: list of tuples (id, name), in the order to scrape them
+    Returns: dict { 'StockID': (main_biz, concepts, market_cap) }
+    Stocks that failed or were not reached (circuit breaker tripped, `deadline`
+    expired) are absent.
+    """
+    if not drivers:
+        return {}
+    if cache is None and all(d is None for d in drivers):
+        return {}
 
-            main_biz = extract("主要業務")
-            concepts = extract("相關概念")
-            market_cap = extract_market_cap()
-            if not market_cap:
-                market_cap = extract("市值") or extract("目前市值") or extract("總市值")
+    items = [(str(sid), name) for sid, name in stock_list]
+    scraped = {}
 
-            # Group is now handled globally, removed from here
+    def _load(driver, item, reload):
+        # A reload comes from an HTTP page that parsed empty: give Chrome a go at it
+        outcome, page = load_goodinfo_detail(driver, item[0], cache=cache, stats=stats, http=not reload, parse=False)
+        if outcome == PAGE_NOT_FOUND:
+            return SKIP_ITEM
+        if outcome not in (PAGE_OK, None):
+            return None
+        return page
 
-            return main_biz, concepts, market_cap
+    def _parse(item, page):
+        if page["data"] is None:
+            outcome = finish_goodinfo_page("detail", page)
+            if outcome == PAGE_NOT_FOUND:
+                print(f"  {item[0]}: not listed on GoodInfo, skipping.")
+                return None
+            if outcome != PAGE_OK:
+                return RELOAD
+        return page
+
+    def _write(item, page):
+        _store_detail_page(cache, item[0], page)
+        result = _detail_tuple(page["data"])
+        if journal is not None:
+            journal.record("detail", stock_id=item[0], fields=list(result))
+        scraped[item[0]] = result
+
+    pipeline = ScrapePipeline(
+        _load, _parse, _write, parse_workers=parse_workers, breaker=breaker or CircuitBreaker(),
+        deadline=deadline, describe=lambda item: f"Fetching GoodInfo for {item[0]} {item[1]}...",
+    )
+    pipeline.run(drivers, items)
+    print(f"GoodInfo details: {len(scraped)}/{len(items)} stocks scraped with {len(drivers)} worker(s).")
+    if pipeline.past_deadline:
+        print(f"Deadline reached: {pipeline.past_deadline} stocks left for the next run.")
+    pipeline.report()
+    return {sid: scraped[sid] for sid, _ in items if sid in scraped}
+
+def _rate_limited_fetch(url, **kwargs):
+    limiter = RATE_LIMITER.host(url)
+    limiter.acquire()
+    try:
+        res = HTTP_SESSION.get(url, **kwargs)
+    except requests.exceptions.Timeout:
+        limiter.failure("timeout")
+        raise
+    except Exception:
+        limiter.failure("error")
+        raise
+    if res.status_code in (403, 429, 503):
+        limiter.failure(f"HTTP {res.status_code}")
+    else:
+        limiter.success()
+    return res
 
-        except Exception as e:
-            if attempt < max_retries - 1:
-                wait_time = (attempt + 1) * 5
-                print(f"  Error fetching GoodInfo for {stock_id}, retrying in {wait_time}s... (attempt {attempt + 1}/{max_retries}): {e}")
-                time.sleep(wait_time)
-                continue
-            else:
-                print(f"  Final error fetching GoodInfo for {stock_id}: {e}")
-                return None, None, None
+def limited_get(url, **kwargs):
+    """
+    GET over the shared pooled session, through the HTTP cache and the per-host
+    rate limiter. Cache hits never touch the network or the limiter.
+    """
+    return HTTP_CACHE.get(url, _rate_limited_fetch, **kwargs)
+
+def load_etf_list(path=ETF_LIST_CSV, etf_ids=None):
+    """
+    ETF IDs to fetch, in column order: `etf_ids` if given (CLI), else the 代號 column
+    of `path`, else DEFAULT_ETF_IDS. Duplicates are dropped.
+    """
+    if not etf_ids:
+        if os.path.exists(path):
+            try:
+                etf_ids = pd.read_csv(path, dtype={"代號": str})["代號"].dropna().tolist()
+            except Exception as e:
+                print(f"Warning: could not read ETF list {path}: {e}")
+        if not etf_ids:
+            etf_ids = DEFAULT_ETF_IDS
+    return list(dict.fromkeys(str(etf).strip() for etf in etf_ids if str(etf).strip()))
 
-    return None, None, None
+def etf_weight_column(etf_id):
+    return f"ETF_{etf_id}_權重"
+
+def parse_etf_holdings(df):
+    """
+    { 'StockID': 'Weight%' } from a MoneyDJ holdings table.
+    個股名稱 looks like "台積電(2330.TW)"; rows without a .TW code (cash, futures) are dropped.
+    """
+    ids = df["個股名稱"].astype(str).str.extract(r'\((\d+)\.TW\)', expand=False)
+    weight = df["投資比例(%)"]
+    weight = weight.astype(str).str.strip().where(weight.notna(), "")
+    has_id = ids.notna()
+    return dict(zip(ids[has_id], weight[has_id]))
 
 def fetch_etf_weights(etf_id):
     """
@@ -592,7 +1706,7 @@ def fetch_etf_weights(etf_id):
     Example: { '2330': '47.5' }
     """
     # Basic0007B seems to be the "All Holdings" view
-    url = f"https://www.moneydj.com/ETF/X/Basic/Basic0007B.xdjhtm?etfid={etf_id}.TW"
+    url = MONEYDJ_ETF_URL.format(etf_id=etf_id)
     
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
@@ -600,7 +1714,7 @@ def fetch_etf_weights(etf_id):
     
     print(f"Fetching ETF {etf_id} weights from MoneyDJ...")
     try:
-        res = requests.get(url, headers=headers, timeout=20, verify=False)
+        res = limited_get(url, headers=headers, timeout=20, verify=False)
         res.encoding = "utf-8"
         
         # Parse tables
@@ -618,24 +1732,7 @@ def fetch_etf_weights(etf_id):
             print(f"Warning: Constituent table not found for ETF {etf_id}")
             return {}
             
-        weights = {}
-        for _, row in target_df.iterrows():
-            name_col = str(row["個股名稱"])
-            weight_col = row["投資比例(%)"]
-            
-            # Parse Stock ID from "Name(ID.TW)"
-            # Example: "台積電(2330.TW)"
-            match = re.search(r'\((\d+)\.TW\)', name_col)
-            if match:
-                stock_id = match.group(1)
-                # Convert weight to string, handle NaN
-                if pd.isna(weight_col):
-                    w_str = ""
-                else:
-                    w_str = str(weight_col).strip()
-                
-                weights[stock_id] = w_str
-        
+        weights = parse_etf_holdings(target_df)
         print(f"  -> Retrieved {len(weights)} constituents for ETF {etf_id}")
         return weights
 
@@ -651,7 +1748,7 @@ def fetch_taifex_weights():
     url = "https://www.taifex.com.tw/cht/9/futuresQADetail"
     try:
         print("Fetching TAIFEX weights...")
-        res = requests.get(url, headers=HEADERS, timeout=20)
+        res = limited_get(url, headers=HEADERS, timeout=20)
         res.encoding = "utf-8" 
         
         # Use pandas to parse the table
@@ -689,259 +1786,654 @@ def fetch_taifex_weights():
         print(f"Error fetching TAIFEX weights: {e}")
         return {}
 
-def fetch_isin_table(mode: int, market_label: str) -> pd.DataFrame:
+ISIN_CHUNK_SIZE = 64 * 1024
+ISIN_CODE_NAME_COLUMN = "有價證券代號及名稱"
+_ISIN_CODE_RE = re.compile(r"(\d\S*)(.*)", re.DOTALL)   # "2330　台積電" -> code, name
+
+def iter_isin_rows(chunks, wanted_ids=None, encoding="big5"):
+    """
+    Streams an ISIN C_public.jsp listing without building the whole table.
+    chunks: iterable of raw response bytes. Each chunk is decoded incrementally and
+    fed to an lxml pull parser; every stock row is yielded as (代號, 名稱, { header: cell })
+    and then dropped from the tree, so memory stays flat however long the listing is.
+    wanted_ids: only rows whose 代號 is in this set (None keeps every row); other rows
+    are rejected on their first cell without reading the rest.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    parser = etree.HTMLPullParser(events=("end",), tag="tr")
+    header = None
+
+    def _rows():
+        nonlocal header
+        for _, tr in parser.read_events():
+            row = None
+            if header is None:
+                cells = ["".join(td.itertext()).strip() for td in tr]
+                if ISIN_CODE_NAME_COLUMN in cells:
+                    header = cells
+            elif len(tr) == len(header):   # skips the section rows (股票, ETF, ...)
+                m = _ISIN_CODE_RE.match("".join(tr[0].itertext()).strip())
+                if m and (wanted_ids is None or m.group(1) in wanted_ids):
+                    cells = ["".join(td.itertext()).strip() for td in tr]
+                    row = (m.group(1), m.group(2).strip(), dict(zip(header, cells)))
+            tr.clear()
+            parent = tr.getparent()
+            if parent is not None:
+                while tr.getprevious() is not None:
+                    del parent[0]
+            if row is not None:
+                yield row
+
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+        yield from _rows()
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    yield from _rows()
+
+def _stream_isin_listing(mode, wanted_ids=None):
+    """Downloads ISIN listing `mode` in chunks and yields its (代號, 名稱, row) tuples."""
+    url = BASE_URL.format(mode=mode)
+    res = limited_get(url, headers=HEADERS, timeout=20, verify=False, stream=True)
+    with res:
+        yield from iter_isin_rows(res.iter_content(ISIN_CHUNK_SIZE), wanted_ids)
+
+def fetch_isin_table(mode: int, market_label: str, wanted_ids=None) -> pd.DataFrame:
     """
     mode = 2 → TWSE（上市）
     mode = 4 → TPEX（上櫃/興櫃）
     market_label = 'TWSE' 或 'TPEX'
+    wanted_ids: 只保留這些代號 (None = 全部)
     """
-    url = BASE_URL.format(mode=mode)
-    res = requests.get(url, headers=HEADERS, timeout=20, verify=False)
-    res.encoding = "big5"
+    records = [
+        (stock_id, name, row.get("市場別"), row.get("產業別"), row.get("上市日"))
+        for stock_id, name, row in _stream_isin_listing(mode, wanted_ids)
+    ]
+    return pd.DataFrame(records, columns=["代號", "名稱_官方", "市場別", "產業別", "上市日"])
+
+def fetch_public_table(wanted_ids=None) -> pd.DataFrame:
+    """
+    mode = 1 → 公開發行
+    Mode 1 Columns: 有價證券代號及名稱, 國際證券辨識號碼..., 公開發行日, 產業別, ...
+    """
+    records = [
+        (stock_id, "公開發行", row.get("產業別"))   # 市場別 manually assigned
+        for stock_id, _, row in _stream_isin_listing(1, wanted_ids)
+    ]
+    return pd.DataFrame(records, columns=["代號", "市場別_PUB", "產業別_PUB"])
+
+def static_sources(wanted_ids=None, etf_ids=DEFAULT_ETF_IDS):
+    """label -> (function, args); every source is independent network I/O."""
+    sources = {
+        "ISIN TWSE": (fetch_isin_table, (2, "TWSE", wanted_ids)),
+        "ISIN TPEX": (fetch_isin_table, (4, "TPEX", wanted_ids)),
+        "ISIN Emerging": (fetch_isin_table, (5, "Emerging", wanted_ids)),
+        "ISIN Public": (fetch_public_table, (wanted_ids,)),
+    }
+    for etf_id in etf_ids:
+        sources[f"ETF {etf_id}"] = (fetch_etf_weights, (etf_id,))
+    sources["TAIFEX"] = (fetch_taifex_weights, ())
+    return sources
+
+def _timed_call(timings, label, func, *args):
+    """Runs func(*args), recording (start, end) perf_counter times under `label`."""
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        timings[label] = (start, time.perf_counter())
+
+def fetch_static_sources(executor, timings, wanted_ids=None, etf_ids=DEFAULT_ETF_IDS):
+    """
+    Fetches every static_sources() entry concurrently on `executor`.
+    ISIN listings keep only `wanted_ids` (None keeps every row).
+    Returns { label: result }; an exception in any source is re-raised.
+    """
+    futures = {
+        label: executor.submit(_timed_call, timings, label, func, *args)
+        for label, (func, args) in static_sources(wanted_ids, etf_ids).items()
+    }
+    return {label: future.result() for label, future in futures.items()}
+
+def report_source_timings(timings, origin):
+    """Prints each source's start/end relative to `origin`; the last one to finish is the critical path."""
+    if not timings:
+        return
+    print("Source timings (relative to run start):")
+    ordered = sorted(timings.items(), key=lambda kv: kv[1][1])
+    for label, (start, end) in ordered:
+        print(f"  {label:<14} {start - origin:6.2f}s -> {end - origin:6.2f}s  ({end - start:5.2f}s)")
+    label, (start, end) = ordered[-1]
+    print(f"  critical path: {label} ({end - origin:.2f}s)")
+
+
+def format_market_cap(yi):
+    """億 amount -> StockDetail's display format: "4,345.9億", "1.06兆"."""
+    if yi >= 10000:
+        return f"{yi / 10000:.2f}".rstrip("0").rstrip(".") + "兆"
+    return f"{yi:,.2f}".rstrip("0").rstrip(".") + "億"
+
+def _market_cap_rows(html):
+    """Cell texts of every row, per table (the stock list table first if it has an id)."""
+    doc = lxml_html.fromstring(html)
+    tables = doc.xpath("//table[@id='tblStockList']") or doc.xpath("//table")
+    return [
+        [[c.text_content().strip() for c in tr if c.tag in ("td", "th")] for tr in table.iter("tr")]
+        for table in tables
+    ]
+
+def _market_caps_from_rows(tables):
+    for rows in tables:
+        code_idx = cap_idx = None
+        scale = 1.0
+        caps = {}
+        for cells in rows:
+            if cap_idx is None:
+                if "代號" in cells and any(c.startswith("市值") for c in cells):
+                    code_idx = cells.index("代號")
+                    cap_idx = next(i for i, c in enumerate(cells) if c.startswith("市值"))
+                    scale = 0.01 if "百萬" in cells[cap_idx] else 1.0
+                continue
+            if len(cells) <= max(code_idx, cap_idx):
+                continue
+            try:
+                yi = float(cells[cap_idx].replace(",", "")) * scale
+            except ValueError:
+                continue
+            caps[cells[code_idx]] = format_market_cap(yi)
+        if caps:
+            return caps
+    return {}
+
+def parse_market_cap_list(html):
+    """
+    Parses a StockList sheet with a 市值 column.
+    Returns: { 'StockID': formatted 市值 }; the repeated header rows and rows
+    without a number are skipped.
+    """
+    return _market_caps_from_rows(_market_cap_rows(html))
+
+def market_cap_list_pages(listings):
+    """
+    listings: frame indexed by 代號 with 市場別 / 產業別.
+    Returns: { list page URL: [StockID, ...] } — one page per (market, industry) that
+    GoodInfo has a sheet for; other stocks (興櫃, 公開發行, no industry) are left out.
+    """
+    pages = {}
+    for sid, market, industry in zip(listings.index, listings["市場別"], listings["產業別"]):
+        if market not in GOODINFO_LIST_MARKETS or not isinstance(industry, str) or not industry.strip():
+            continue
+        url = GOODINFO_INDUSTRY_LIST_URL.format(
+            market=quote(market), industry=quote(industry.strip()), sheet=quote(GOODINFO_MARKET_CAP_SHEET),
+        )
+        pages.setdefault(url, []).append(str(sid))
+    return pages
 
-    df = pd.read_html(StringIO(res.text))[0]
+def harvest_market_caps(drivers, listings, cache=None, breaker=None, deadline=None):
+    """
+    Collects 市值 for the stocks in `listings` from a handful of StockList sheets,
+    crawled concurrently on the driver pool (cached pages need no driver).
+    Returns: { 'StockID': 市值 } for the stocks found.
+    """
+    pages = market_cap_list_pages(listings)
+    if not pages:
+        return {}
 
-    df.columns = df.iloc[0]
-    df = df.iloc[1:].copy()
+    def _harvest(drv, url):
+        return _load_goodinfo_list_page(drv, url, "market_cap_list", "td", cache)
 
-    df = df.rename(
-        columns={
-            "有價證券代號及名稱": "代號名稱",
-            "上市日": "上市日",
-            "市場別": "市場別",
-            "產業別": "產業別",
-        }
+    harvested = run_on_driver_pool(
+        drivers or [None], list(pages), _harvest, breaker=breaker, deadline=deadline,
+        describe=lambda url: f"Harvesting 市值: {unquote(url.split('?', 1)[1])}",
     )
+    caps = {}
+    for url, wanted in pages.items():
+        page_caps = harvested.get(url) or {}
+        caps.update({sid: page_caps[sid] for sid in wanted if sid in page_caps})
+    print(f"Bulk 市值: {len(caps)}/{len(listings)} stocks from {len(harvested)}/{len(pages)} list pages.")
+    return caps
+
+def load_previous_output(path=OUTPUT_CSV):
+    """Returns the previous output indexed by 代號 (empty frame if unavailable)."""
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    try:
+        prev = pd.read_csv(path, dtype={"代號": str}, encoding="utf-8-sig")
+        return prev.drop_duplicates(subset="代號").set_index("代號")
+    except Exception as e:
+        print(f"Warning: Could not load previous output: {e}")
+        return pd.DataFrame()
 
-    # 保留代號開頭為數字者
-    df = df[df["代號名稱"].astype(str).str.match(r"^\d+")].copy()
+def field_staleness(prev, stock_ids, now, ttls=FIELD_TTLS):
+    """
+    Age of each GoodInfo field as a multiple of its TTL; inf when the stock is new
+    or its `<field>_timestamp` is missing.
+    Returns: DataFrame of floats (index: 代號, columns: fields)
+    """
+    index = pd.Index([str(s) for s in stock_ids], name="代號")
+    staleness = pd.DataFrame(np.inf, index=index, columns=list(ttls))
+    for field, ttl in ttls.items():
+        col = f"{field}_timestamp"
+        if col not in prev.columns:
+            continue
+        ts = pd.to_datetime(prev[col], format=TIMESTAMP_FORMAT, errors="coerce").reindex(index)
+        age = (pd.Timestamp(now) - ts).dt.total_seconds()
+        staleness[field] = (age / ttl).fillna(np.inf)
+    return staleness
+
+def stale_fields(prev, stock_ids, now, ttls=FIELD_TTLS):
+    """
+    Marks which GoodInfo fields need refetching for each stock.
+    A field is stale when the stock is new, its `<field>_timestamp` is missing,
+    or the timestamp is older than the field's TTL.
+    Returns: DataFrame of bools (index: 代號, columns: fields)
+    """
+    return ~(field_staleness(prev, stock_ids, now, ttls) <= 1)
 
-    # 拆代號與名稱
-    df["代號"] = df["代號名稱"].str.extract(r"^(\S+)")
-    df["名稱_官方"] = df["代號名稱"].str.replace(r"^\S+", "", regex=True).str.strip()
+def load_focus_ids(path=FOCUS_CSV):
+    """代號 of the focus watchlist (empty if the file is missing)."""
+    if not os.path.exists(path):
+        return set()
+    try:
+        return set(pd.read_csv(path, dtype={"代號": str})["代號"].astype(str).str.strip())
+    except Exception as e:
+        print(f"Warning: Could not read focus list {path}: {e}")
+        return set()
 
-    return df[["代號", "名稱_官方", "市場別", "產業別", "上市日"]]
+def scrape_priority(stock_ids, focus_ids, staleness, taiex_weights, weights=PRIORITY_WEIGHTS):
+    """
+    Scrape priority per stock (higher first): the PRIORITY_WEIGHTS-weighted sum of
+    focus-list membership (0/1), the staleness of its stalest detail field (see
+    field_staleness(), capped at STALENESS_CAP and scaled to 0..1) and its TAIEX
+    weight percentile (0 outside the index).
+    taiex_weights: { 'StockID': '1.23%' } as fetched from TAIFEX.
+    Returns: Series indexed by 代號
+    """
+    index = pd.Index([str(s) for s in stock_ids], name="代號")
+    focus = pd.Series(index.isin(list(focus_ids)), index=index).astype(float)
+    stale = staleness.reindex(index)[DETAIL_FIELDS].max(axis=1).fillna(np.inf)
+    stale = stale.clip(upper=STALENESS_CAP) / STALENESS_CAP
+    taiex = pd.Series(index.map(taiex_weights), index=index, dtype=object)
+    taiex = pd.to_numeric(taiex.astype(str).str.rstrip("%"), errors="coerce")
+    weight_rank = taiex.rank(pct=True).fillna(0.0)
+    return (weights["focus"] * focus + weights["staleness"] * stale
+            + weights["taiex_weight"] * weight_rank)
+
+def prioritize(stock_list, priority):
+    """stock_list [(id, name)] by descending priority; ties keep watchlist order."""
+    return sorted(stock_list, key=lambda s: -priority.get(str(s[0]), 0.0))
+
+# === Post-fetch assembly (vectorized, on a frame indexed by 代號) ===
+
+def coalesce_listings(base, listings):
+    """
+    Returns `base` indexed by 代號 with 市場別 / 產業別 taken from the first of
+    `listings` (frames with 代號 / 市場別 / 產業別, in priority order) that lists the stock.
+    """
+    merged = base.set_index(base["代號"].rename(None))
+    merged["市場別"] = None
+    merged["產業別"] = None
+    for listing in listings:
+        listing = listing.drop_duplicates(subset="代號").set_index("代號")
+        for col in ("市場別", "產業別"):
+            merged[col] = merged[col].fillna(listing[col].reindex(merged.index))
+    return merged
+
+def carry_forward_columns(merged, prev, columns):
+    """
+    Copies `columns` of the previous output into `merged` (matched on 代號) as object
+    columns: a column the CSV had all empty reads back as float64, which would reject
+    the strings written over it later.
+    """
+    for col in columns:
+        if col in prev.columns:
+            merged[col] = pd.Series(merged.index.map(prev[col]), index=merged.index, dtype=object)
 
+def apply_detail_results(merged, details, run_stamp):
+    """
+    Writes scraped { 代號: (主要業務, 相關概念, 市值) } into `merged` and stamps them.
+    市值 is only overwritten where the scrape found one.
+    Returns the set of 代號 whose details were refreshed.
+    """
+    if not details:
+        return set()
+    scraped = pd.DataFrame.from_dict(details, orient="index", columns=DETAIL_FIELDS)
+    hit = merged.index.isin(scraped.index)
+    for col in ("主要業務", "相關概念"):
+        merged.loc[hit, col] = merged.index[hit].map(scraped[col])
+        merged.loc[hit, f"{col}_timestamp"] = run_stamp
+    apply_market_caps(merged, scraped["市值"], run_stamp)
+    return set(merged.index[hit])
+
+def apply_market_caps(merged, caps, run_stamp):
+    """Writes { 代號: 市值 } (dict or Series) into `merged`, skipping missing values, and stamps them."""
+    market_cap = pd.Series(merged.index.map(caps), index=merged.index)
+    has_cap = market_cap.notna()
+    merged.loc[has_cap, "市值"] = market_cap[has_cap]
+    merged.loc[has_cap, "市值_timestamp"] = run_stamp
+
+def apply_market_cap_fallback(merged, prev):
+    """Fills missing 市值 from the previous output, keeping its original timestamp."""
+    if "市值" not in prev.columns:
+        return
+    fallback = pd.Series(merged.index.map(prev["市值"]), index=merged.index)
+    use = merged["市值"].isna() & fallback.notna() & fallback.astype(str).ne("")
+    merged.loc[use, "市值"] = fallback[use]
+    if "市值_timestamp" in prev.columns:
+        merged.loc[use, "市值_timestamp"] = merged.index[use].map(prev["市值_timestamp"])
+    else:
+        merged.loc[use, "市值_timestamp"] = None
+
+def merge_llm_concepts(merged, results):
+    """Appends { 代號: concepts } from the LLM to 相關概念 (or sets it when empty)."""
+    if not results:
+        return
+    llm = pd.Series(merged.index.map(pd.Series(results, dtype=object)), index=merged.index)
+    existing = merged["相關概念"]
+    empty = existing.isna() | existing.astype(str).str.strip().eq("")
+    combined = existing.astype(str) + ";" + llm.astype(str)
+    has_llm = llm.notna() & llm.astype(str).ne("")   # "" = LLM found no relation
+    merged.loc[has_llm, "相關概念"] = combined.where(~empty, llm)[has_llm]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Enrich the watchlist into raw_companyinfo.csv")
+    parser.add_argument("--workers", type=int, default=GOODINFO_WORKERS,
+                        help=f"Number of headless Chrome drivers scraping GoodInfo in parallel (default: {GOODINFO_WORKERS})")
+    parser.add_argument("--parse-workers", type=int, default=DEFAULT_PARSE_WORKERS,
+                        help="Threads parsing GoodInfo pages fetched over HTTP while the load workers keep "
+                             f"fetching (default: {DEFAULT_PARSE_WORKERS})")
+    parser.add_argument("--min-interval", type=float, default=GOODINFO_MIN_INTERVAL,
+                        help="Floor on seconds between GoodInfo page loads across all workers; the adaptive "
+                             f"limiter starts at 3s and ramps towards this while responses are healthy (default: {GOODINFO_MIN_INTERVAL})")
+    parser.add_argument("--browser-profile", choices=BROWSER_PROFILES, default="scrape",
+                        help="'scrape': eager load with images/fonts/CSS/ads blocked; 'full': plain headless Chrome (default: scrape)")
+    parser.add_argument("--driver-max-pages", type=int, default=DEFAULT_MAX_PAGES,
+                        help=f"Recycle a Chrome driver after this many page loads; 0 = never (default: {DEFAULT_MAX_PAGES})")
+    parser.add_argument("--driver-max-rss-mb", type=float, default=DEFAULT_MAX_RSS_MB,
+                        help=f"Recycle a Chrome driver once its process tree uses more memory than this; 0 = never "
+                             f"(default: {DEFAULT_MAX_RSS_MB})")
+    parser.add_argument("--goodinfo-fetch", choices=GOODINFO_FETCH_MODES, default="http",
+                        help="'http': after Chrome passes GoodInfo's JS challenge once, fetch pages over plain HTTP with its "
+                             "cookies, falling back to the browser on a re-challenge or block; 'browser': load every page "
+                             "in Chrome (default: http)")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Ignore cached GoodInfo pages and reload everything (fresh pages are still cached)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Disable the on-disk GoodInfo page cache entirely")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH,
+                        help=f"GoodInfo page cache location (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="Evict the oldest cached pages beyond this size (default: %(default)s)")
+    parser.add_argument("--no-http-cache", action="store_true",
+                        help="Always download ISIN / MoneyDJ / TAIFEX pages instead of revalidating cached copies")
+    parser.add_argument("--http-cache-ttl", type=float, default=None, metavar="HOURS",
+                        help="Reuse cached pages without ETag/Last-Modified for this long (default: per host, 6-12 hours)")
+    parser.add_argument("--llm-workers", type=int, default=None,
+                        help=f"Concurrent LLM batches, one per API key (default: every {LLM_KEY_ENV}_1..{LLM_MAX_KEYS} that is set)")
+    parser.add_argument("--llm-token-budget", type=int, default=LLM_TOKEN_BUDGET,
+                        help=f"Estimated prompt + reply tokens per LLM call (default: {LLM_TOKEN_BUDGET})")
+    parser.add_argument("--llm-refresh", action="store_true",
+                        help="Ignore cached LLM concept answers (new answers are still cached)")
+    parser.add_argument("--llm-invalidate", nargs="+", metavar="ID", default=None,
+                        help="Drop cached LLM answers for these stock IDs ('all' clears the cache)")
+    parser.add_argument("--llm-cache-ttl", type=float, default=DEFAULT_LLM_CACHE_TTL / 86400, metavar="DAYS",
+                        help=f"Reuse cached LLM answers for this long (default: {DEFAULT_LLM_CACHE_TTL // 86400} days)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume today's run from the checkpoint journal, skipping stocks, group map and LLM batches already done")
+    parser.add_argument("--from-journal", action="store_true",
+                        help="Build the output from today's journal only, without scraping GoodInfo or calling the LLM")
+    parser.add_argument("--journal-path", default=DEFAULT_JOURNAL_PATH,
+                        help=f"Checkpoint journal location (default: {DEFAULT_JOURNAL_PATH})")
+    parser.add_argument("--bulk-market-cap", action="store_true",
+                        help="Take 市值 from GoodInfo's per-industry StockList sheets; StockDetail pages are then only "
+                             "loaded for stale 主要業務 / 相關概念 (or stocks missing from the sheets)")
+    parser.add_argument("--etfs", nargs="+", metavar="ID", default=None,
+                        help=f"ETF IDs to add ETF_<ID>_權重 columns for (default: the 代號 column of {ETF_LIST_CSV}, "
+                             f"or {' '.join(DEFAULT_ETF_IDS)} if it is missing)")
+    parser.add_argument("--etf-list", default=ETF_LIST_CSV,
+                        help=f"CSV listing the ETFs to fetch (default: {ETF_LIST_CSV})")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only re-scrape GoodInfo fields that are new or past their TTL; keep the rest from the previous output")
+    parser.add_argument("--deadline", type=float, default=None, metavar="MINUTES",
+                        help="Wall-clock budget for the whole run. Stocks are scraped in priority order; whatever is "
+                             "not reached keeps its previous values and the output is still written in time")
+    parser.add_argument("--deadline-reserve", type=float, default=DEADLINE_RESERVE / 60, metavar="MINUTES",
+                        help="Part of --deadline kept back after GoodInfo scraping for the LLM stage "
+                             f"(default: {DEADLINE_RESERVE // 60}, at most a quarter of --deadline)")
+    parser.add_argument("--focus-csv", default=FOCUS_CSV,
+                        help=f"Watchlist whose stocks are scraped first (default: {FOCUS_CSV})")
+    args = parser.parse_args(argv)
+    if args.deadline is not None:
+        if args.deadline <= 0:
+            parser.error("--deadline must be positive")
+        cap = args.deadline * DEADLINE_RESERVE_MAX_SHARE
+        if args.deadline_reserve > cap:
+            print(f"Warning: --deadline-reserve {args.deadline_reserve:g} leaves too little of --deadline "
+                  f"{args.deadline:g} for scraping; reserving {cap:g} minutes instead.")
+            args.deadline_reserve = cap
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    run_time = datetime.utcnow()
+    run_stamp = run_time.strftime(TIMESTAMP_FORMAT)
+    run_clock = time.perf_counter()
+    budget = args.deadline * 60 if args.deadline is not None else None
+    scrape_deadline, final_deadline = run_deadlines(budget, args.deadline_reserve * 60)
+    # Stocks not refreshed this run keep their previous values (and timestamps)
+    carry_forward = args.incremental or budget is not None
+
+    HTTP_CACHE.enabled = not args.no_http_cache
+    GOODINFO_HTTP.enabled = args.goodinfo_fetch == "http"
+    if args.http_cache_ttl is not None:
+        ttl = args.http_cache_ttl * 3600
+        HTTP_CACHE.default_ttl = ttl
+        HTTP_CACHE.ttls = {host: ttl for host in HTTP_CACHE.ttls}
+
+    etf_ids = load_etf_list(args.etf_list, args.etfs)
+    etf_columns = [etf_weight_column(etf_id) for etf_id in etf_ids]
 
-def main():
     # 1) 讀 base CSV
     base = pd.read_csv(INPUT_CSV, dtype={"代號": str})
     base["代號"] = base["代號"].astype(str).str.strip()
 
-    # 2) 抓 TWSE + TPEX 官方資料
-    print("下載 TWSE（上市）資料...")
-    twse_raw = fetch_isin_table(2, "TWSE")
+    # === Load previous output (market cap fallback / incremental state) ===
+    prev = load_previous_output()
+    if "市值" in prev.columns:
+        print(f"Loaded {int(prev['市值'].notna().sum())} previous market cap values as fallback.")
 
-    print("下載 TPEX（上櫃）資料...")
-    tpex_raw = fetch_isin_table(4, "TPEX")
+    staleness = field_staleness(prev, base["代號"], run_time)
+    stale = ~(staleness <= 1)
+    if args.incremental:
+        print(f"Incremental mode: {int(stale.any(axis=1).sum())}/{len(stale)} stocks have stale GoodInfo fields.")
+    else:
+        stale.loc[:, :] = True
 
-    print("下載 Emerging（興櫃）資料...")
-    emg_raw = fetch_isin_table(5, "Emerging")
+    detail_needed = stale[DETAIL_FIELDS].any(axis=1)
+    groups_needed = bool(stale["相關集團"].any())
+    concepts_refreshed = set()
 
-    print("下載 Public（公開發行）資料...")
-    
-    url_pub = BASE_URL.format(mode=1)
-    res_pub = requests.get(url_pub, headers=HEADERS, timeout=20, verify=False)
-    res_pub.encoding = "big5"
-    pub_df = pd.read_html(StringIO(res_pub.text))[0]
-    pub_df.columns = pub_df.iloc[0]
-    pub_df = pub_df.iloc[1:].copy()
-    
-    # Mode 1 Columns: 有價證券代號及名稱, 國際證券辨識號碼..., 公開發行日, 產業別, ...
-    pub_df = pub_df.rename(
-        columns={
-            "有價證券代號及名稱": "代號名稱",
-            "產業別": "產業別_PUB",
-        }
+    # === Checkpoint journal (resume / partial output) ===
+    journal = RunJournal(
+        args.journal_path, day=run_time.strftime("%Y-%m-%d"),
+        resume=args.resume or args.from_journal,
     )
-    # Filter stocks
-    pub_df = pub_df[pub_df["代號名稱"].astype(str).str.match(r"^\d+")].copy()
-    pub_df["代號"] = pub_df["代號名稱"].str.extract(r"^(\S+)")
-    pub_df["市場別_PUB"] = "公開發行" # Manually assign
-    
-    pub = pub_df[["代號", "市場別_PUB", "產業別_PUB"]]
-
-    # === 產生 TWSE 欄位 ===
-    twse = twse_raw.rename(
-        columns={
-            "市場別": "市場別_TWSE",
-            "產業別": "產業別_TWSE",
-        }
-    )[
-        [
-            "代號",
-            "市場別_TWSE",
-            "產業別_TWSE",
-        ]
-    ]
-
-    # === 產生 TPEX 欄位 ===
-    tpex = tpex_raw.rename(
-        columns={
-            "市場別": "市場別_TPEX",
-            "產業別": "產業別_TPEX",
-        }
-    )[
-        [
-            "代號",
-            "市場別_TPEX",
-            "產業別_TPEX",
-        ]
-    ]
+    journaled_details = journal.details()
+    journaled_groups = journal.group_map()
 
-    # === 產生 Emerging 欄位 ===
-    emg = emg_raw.rename(
-        columns={
-            "市場別": "市場別_EMG",
-            "產業別": "產業別_EMG",
-        }
-    )[
-        [
-            "代號",
-            "市場別_EMG",
-            "產業別_EMG",
-        ]
+    stock_list = [
+        (sid, name) for sid, name in zip(base["代號"], base["名稱"])
+        if detail_needed.get(str(sid), True) and str(sid) not in journaled_details
     ]
+    if args.from_journal:
+        stock_list = []
+    if journaled_details:
+        print(f"Journal: {len(journaled_details)} stock details already done today.")
+    print(f"GoodInfo work: {len(stock_list)} stock detail pages, group crawl {'needed' if groups_needed else 'skipped (fresh)'}.")
+
+    # 2) 抓 TWSE / TPEX / 興櫃 / 公開發行 官方資料、ETF 權重、TAIFEX 權重 (同時下載)
+    #    Chrome start-up overlaps with these downloads.
+    crawl_groups = groups_needed and journaled_groups is None and not args.from_journal
+    timings = {}
+    executor = ThreadPoolExecutor(max_workers=STATIC_SOURCE_WORKERS + 1)
+    driver_future = None
+    if stock_list or crawl_groups:
+        driver_future = executor.submit(
+            _timed_call, timings, "Chrome start", start_driver_pool, args.workers, args.browser_profile,
+            args.driver_max_pages, args.driver_max_rss_mb,
+        )
 
-    # 3) 抓取 ETF 成分股權重 (0050, 0056, 00878, 00919)
-    print("下載 ETF 0050 成分股權重...")
-    weights_0050 = fetch_etf_weights("0050")
-
-    print("下載 ETF 0056 成分股權重...")
-    weights_0056 = fetch_etf_weights("0056")
-
-    print("下載 ETF 00878 成分股權重...")
-    weights_00878 = fetch_etf_weights("00878")
-
-    print("下載 ETF 00919 成分股權重...")
-    weights_00919 = fetch_etf_weights("00919")
-
-    print("下載 TAIFEX 大盤權重...")
-    weights_taifex = fetch_taifex_weights()
-
-    # 4) 合併
-    merged = base.merge(twse, on="代號", how="left")
-    merged = merged.merge(tpex, on="代號", how="left")
-    merged = merged.merge(emg, on="代號", how="left")
-    merged = merged.merge(pub, on="代號", how="left")
+    print("下載 ISIN（上市/上櫃/興櫃/公開發行）、ETF 成分股權重、TAIFEX 大盤權重...")
+    static = fetch_static_sources(executor, timings, wanted_ids=set(base["代號"]), etf_ids=etf_ids)
+    twse_raw = static["ISIN TWSE"]
+    tpex_raw = static["ISIN TPEX"]
+    emg_raw = static["ISIN Emerging"]
+    pub = static["ISIN Public"]
+    weights_taifex = static["TAIFEX"]
 
-    # === 合併欄位 ===
+    # 3) 合併 — one frame indexed by 代號
     # 優先順序: TWSE > TPEX > Emerging > Public
-    merged["市場別"] = (
-        merged["市場別_TWSE"]
-        .fillna(merged["市場別_TPEX"])
-        .fillna(merged["市場別_EMG"])
-        .fillna(merged["市場別_PUB"])
-    )
-    merged["產業別"] = (
-        merged["產業別_TWSE"]
-        .fillna(merged["產業別_TPEX"])
-        .fillna(merged["產業別_EMG"])
-        .fillna(merged["產業別_PUB"])
-    )
-    merged["市值"] = None
+    pub = pub.rename(columns={"市場別_PUB": "市場別", "產業別_PUB": "產業別"})
+    merged = coalesce_listings(base, [twse_raw, tpex_raw, emg_raw, pub])
 
     # === Mapping ETF Weights ===
-    merged["ETF_0050_權重"] = merged["代號"].map(weights_0050)
-    merged["ETF_0056_權重"] = merged["代號"].map(weights_0056)
-    merged["ETF_00878_權重"] = merged["代號"].map(weights_00878)
-    merged["ETF_00919_權重"] = merged["代號"].map(weights_00919)
-    merged["市值佔大盤比重"] = merged["代號"].map(weights_taifex)
+    for etf_id, col in zip(etf_ids, etf_columns):
+        merged[col] = merged.index.map(static[f"ETF {etf_id}"])
+    merged["市值佔大盤比重"] = merged.index.map(weights_taifex)
+
+    # Under a deadline, most important work first so what is left over matters least
+    if budget is not None:
+        priority = scrape_priority(merged.index, load_focus_ids(args.focus_csv), staleness, weights_taifex)
+        stock_list = prioritize(stock_list, priority)
 
     # Initialize empty columns
     merged["主要業務"] = None
     merged["相關概念"] = None
     merged["相關集團"] = None
     merged["市值"] = None
+    for col in FRESHNESS_COLUMNS:
+        merged[col] = None
 
-    # === Load previous market cap values as fallback ===
-    prev_market_cap = {}
-    if os.path.exists(OUTPUT_CSV):
-        try:
-            prev_df = pd.read_csv(OUTPUT_CSV, dtype={"代號": str}, encoding="utf-8-sig")
-            if "市值" in prev_df.columns:
-                prev_market_cap = prev_df.set_index("代號")["市值"].dropna().to_dict()
-                print(f"Loaded {len(prev_market_cap)} previous market cap values as fallback.")
-        except Exception as e:
-            print(f"Warning: Could not load previous market cap values: {e}")
+    if carry_forward:
+        # Carry forward previous values; fresh scrapes overwrite them below
+        carry_forward_columns(merged, prev, ["主要業務", "相關集團", *FRESHNESS_COLUMNS])
 
     # === Fetch GoodInfo Data (Selenium) ===
-    driver = get_selenium_driver()
-    if driver:
-        # 1. Fetch Group Map (Bulk)
-        print("Step 1: Fetching Group Map...")
-        group_map = get_goodinfo_group_map(driver)
-
-        # 2. Fetch Individual Stock Details
-        print("Step 2: Fetching Stock Details...")
-        total = len(merged)
-        consecutive_failures = 0
-
-        for idx, row in merged.iterrows():
-            if consecutive_failures >= 5:
-                print("Too many consecutive failures (IP blocked?). Stopping GoodInfo scrape.")
-                break
-
-            stock_id = row["代號"]
-            print(f"[{idx+1}/{total}] Fetching GoodInfo for {stock_id} {row['名稱']}...")
-
-            # Fetch Business & Concepts
-            mb, cc, mv = fetch_goodinfo_data(driver, stock_id)
-
-            if mb is None and cc is None and mv is None:
-                consecutive_failures += 1
-            else:
-                consecutive_failures = 0
-
-            # Get Group from Map
-            gp = group_map.get(str(stock_id))
+    page_cache = None
+    if not args.no_cache:
+        page_cache = PageCache(
+            args.cache_path,
+            max_bytes=int(args.cache_max_mb * 1024 * 1024),
+            refresh=args.refresh,
+        )
 
-            # Update DataFrame directly
-            merged.at[idx, "主要業務"] = mb
-            merged.at[idx, "相關概念"] = cc
-            merged.at[idx, "相關集團"] = gp
-            # Fall back to previous value if scrape returned None
-            merged.at[idx, "市值"] = mv if mv is not None else prev_market_cap.get(str(stock_id))
+    drivers = driver_future.result() if driver_future is not None else []
+    executor.shutdown()
+    report_source_timings(timings, run_clock)
+    if not drivers and page_cache is not None:
+        print("Selenium not available — parsing cached GoodInfo pages only.")
+    RATE_LIMITER.configure("goodinfo.tw", max_rate=1 / max(args.min_interval, 0.01))
 
-            # Delay to be polite/avoid being blocked (longer for CI environments)
-            time.sleep(3)
+    # 1. Fetch Group Map (Bulk)
+    if groups_needed:
+        print("Step 1: Fetching Group Map...")
+        if journaled_groups is not None:
+            print("Journal: using today's group map.")
+            group_map, groups_crawled_at = journaled_groups
+        elif args.from_journal:
+            group_map, groups_crawled_at = {}, 0
+        else:
+            group_map, groups_crawled_at = get_goodinfo_group_map(
+                drivers, cache=page_cache, refresh=args.refresh, deadline=scrape_deadline,
+            )
+            if group_map:
+                journal.record("group_map", map=group_map, crawled_at=groups_crawled_at)
+        # An empty map means the crawl failed — keep carried values in incremental mode
+        if group_map or not carry_forward:
+            merged["相關集團"] = merged.index.map(group_map)
+            if group_map:
+                merged["相關集團_timestamp"] = datetime.utcfromtimestamp(groups_crawled_at).strftime(TIMESTAMP_FORMAT)
+
+    # 1b. Bulk 市值 for stocks whose text fields are still fresh
+    if args.bulk_market_cap and stock_list and (drivers or page_cache is not None):
+        text_stale = set(stale.index[stale[["主要業務", "相關概念"]].any(axis=1)])
+        cap_only = [str(sid) for sid, _ in stock_list if str(sid) not in text_stale]
+        if cap_only:
+            print(f"Step 1b: Harvesting 市值 for {len(cap_only)} stocks from StockList sheets...")
+            bulk_caps = harvest_market_caps(
+                drivers, merged.loc[merged.index.isin(cap_only), ["市場別", "產業別"]], cache=page_cache,
+                deadline=scrape_deadline,
+            )
+            apply_market_caps(merged, bulk_caps, run_stamp)
+            stock_list = [s for s in stock_list if str(s[0]) not in bulk_caps]
+            print(f"Bulk 市值: {len(stock_list)} stocks still need StockDetail pages.")
+
+    # 2. Fetch Individual Stock Details
+    if drivers or page_cache is not None or journaled_details:
+        print(f"Step 2: Fetching Stock Details ({len(drivers)} workers)...")
+        load_stats = PageLoadStats(args.browser_profile)
+        details = scrape_goodinfo_details(
+            drivers or [None], stock_list, cache=page_cache, stats=load_stats, journal=journal,
+            parse_workers=args.parse_workers, deadline=scrape_deadline,
+        )
+        load_stats.report()
+        details = {**journaled_details, **details}
 
-        driver.quit()
+        concepts_refreshed = apply_detail_results(merged, details, run_stamp)
     else:
         print("Skipping GoodInfo fetch (Selenium not available) — using previous market cap values.")
 
-    # Apply fallback for any remaining None market cap values
-    for idx, row in merged.iterrows():
-        if pd.isna(row["市值"]) or row["市值"] is None:
-            fallback = prev_market_cap.get(str(row["代號"]))
-            if fallback:
-                merged.at[idx, "市值"] = fallback
+    stop_driver_pool(drivers)
+    GOODINFO_HTTP.report()
+    if page_cache is not None:
+        page_cache.close()
+
+    # Apply fallback for any remaining None market cap values (keeping their original timestamp)
+    apply_market_cap_fallback(merged, prev)
 
     none_count = merged["市值"].isna().sum()
     print(f"Market cap coverage: {len(merged) - none_count}/{len(merged)} stocks have 市值 data.")
 
     # === Fetch LLM Concepts ===
     # Prepare list [(id, name)]
-    stock_list_for_llm = list(zip(merged["代號"], merged["名稱"]))
-    gemini_results = fetch_llm_concepts(stock_list_for_llm)
+    llm_done, gemini_results = journal.llm_batches()
+    stock_list_for_llm = [
+        (sid, name) for sid, name in zip(merged["代號"], merged["名稱"])
+        if str(sid) not in llm_done
+    ]
+    if llm_done:
+        print(f"Journal: {len(llm_done)} stocks already sent to the LLM today.")
+    if stock_list_for_llm and not args.from_journal and not llm_available():
+        print("Skipping LLM analysis (llm SDK not found or no GEMINI_API_KEY set).")
+    elif stock_list_for_llm and not args.from_journal:
+        llm_cache = LLMConceptCache(
+            CONCEPT_PROMPT_VERSION, LLM_MODEL_KEY,
+            ttl=args.llm_cache_ttl * 86400, refresh=args.llm_refresh,
+        )
+        if args.llm_invalidate:
+            ids = None if args.llm_invalidate == ["all"] else args.llm_invalidate
+            print(f"LLM cache: invalidated {llm_cache.invalidate(ids)} answers.")
+        gemini_results.update(fetch_llm_concepts(
+            stock_list_for_llm, journal=journal, cache=llm_cache,
+            business=merged["主要業務"].to_dict(), workers=args.llm_workers,
+            token_budget=args.llm_token_budget, deadline=final_deadline,
+        ))
+        llm_cache.close()
 
     if gemini_results:
         print(f"Merging {len(gemini_results)} LLM concepts...")
-        for sid, concepts in gemini_results.items():
-            # Find the row
-            mask = merged["代號"] == sid
-            if mask.any():
-                idx = merged[mask].index[0]
-                existing = merged.at[idx, "相關概念"]
-                
-                # Append or Set
-                if pd.isna(existing) or existing is None or str(existing).strip() == "":
-                    merged.at[idx, "相關概念"] = concepts
-                else:
-                    # Avoid duplicates if possible, but simple append for now
-                    merged.at[idx, "相關概念"] = f"{existing};{concepts}"
+        merge_llm_concepts(merged, gemini_results)
 
     merged = add_concept_flag_columns(merged)
+
+    # Rows whose GoodInfo concepts were not re-scraped keep their previous flags
+    if carry_forward:
+        carried = ~merged.index.isin(concepts_refreshed)
+        for col in CONCEPT_COLUMNS:
+            if col in prev.columns:
+                prev_flags = merged.index[carried].map(prev[col]).fillna(0).astype(int).to_numpy()
+                merged.loc[carried, col] = merged.loc[carried, col] | prev_flags
+
     if "相關概念" in merged.columns:
         merged = merged.drop(columns=["相關概念"])
 
@@ -953,13 +2445,11 @@ def main():
         "產業別",          # This serves as '相關產業'
         "市值",
         "市值佔大盤比重",
-        "ETF_0050_權重",
-        "ETF_0056_權重",
-        "ETF_00878_權重",
-        "ETF_00919_權重",
+        *etf_columns,
         "主要業務",
         *CONCEPT_COLUMNS,
         "相關集團",
+        *FRESHNESS_COLUMNS,
     ]
 
     for c in merged.columns:
@@ -973,7 +2463,7 @@ def main():
             # 排除已合併的原始欄位，保留其他可能的額外欄位
             col_order.append(c)
 
-    merged = merged[col_order]
+    merged = merged[col_order].reset_index(drop=True)
 
     # 6) 存檔
     process_timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
@@ -981,6 +2471,15 @@ def main():
     merged["process_timestamp"] = process_timestamp
     merged.to_csv(OUTPUT_CSV, index=False, encoding="utf-8-sig")
 
+    if budget is not None:
+        used = time.monotonic() - scrape_deadline.started
+        print(f"Deadline: output written after {used / 60:.1f} of {budget / 60:.1f} minutes.")
+
+    HTTP_CACHE.close()
+    RATE_LIMITER.report()
+    EXTRACTION_STATS.report()
+    PAGE_OUTCOMES.report()
+
     print("\n=== 已完成 ===")
     print(f"輸出：{OUTPUT_CSV}")
 
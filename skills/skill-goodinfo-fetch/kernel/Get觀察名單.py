@@ -13,13 +13,19 @@ import os
 import time
 from datetime import datetime
 
+from http_cache import HttpCache, new_session
+
+# GitHub raw serves an ETag, so an unchanged list costs a 304
+SESSION = new_session(pool_size=2)
+HTTP_CACHE = HttpCache()
+
 def download_file(url, output_file, description, add_taiex=False):
     """Download a file from a URL and save it locally."""
     try:
         print(f"正在下載 {description}...")
         print(f"來源: {url}")
 
-        response = requests.get(url, timeout=30)
+        response = HTTP_CACHE.get(url, SESSION.get, timeout=30)
         response.raise_for_status()
 
         content = response.content.decode('utf-8')
@@ -71,6 +77,7 @@ def main():
     success_focus = download_file(url_focus, file_focus, "專注名單", add_taiex=False)
 
     print("=" * 60)
+    HTTP_CACHE.close()
     if success_obs and success_focus:
         print("所有名單更新完成! 🎉")
     else:
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+driver_manager.py
+Description: Lifecycle of the Selenium drivers FetchCompanyInfo.py scrapes GoodInfo with.
+             ManagedDriver wraps one Chrome session: it is recycled (quit and started
+             afresh) after a number of page loads or once the browser's process tree
+             grows past an RSS cap, and restarted transparently when the session dies
+             mid-run. The chromedriver binary location is cached on disk, so
+             webdriver-manager is not consulted on every run.
+"""
+
+import json
+import os
+import threading
+import time
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+DRIVER_PATH_CACHE = os.path.join(".cache", "chromedriver_path.json")
+DRIVER_PATH_TTL = 7 * 86400      # re-resolve the chromedriver binary weekly
+DEFAULT_MAX_PAGES = 300          # page loads before a browser is recycled
+DEFAULT_MAX_RSS_MB = 1500        # browser process-tree RSS that forces a recycle
+
+# WebDriver error texts meaning the browser session itself is gone
+SESSION_LOST_SIGNATURES = (
+    "invalid session id", "session deleted", "disconnected", "chrome not reachable",
+    "no such window", "target window already closed", "Connection refused", "Max retries exceeded",
+)
+
+_driver_path_lock = threading.Lock()
+_driver_path = None
+
+
+def cached_driver_path(install, path=DRIVER_PATH_CACHE, ttl=DRIVER_PATH_TTL):
+    """
+    chromedriver location from `install()` (e.g. ChromeDriverManager().install),
+    resolved once per process and remembered in `path` for `ttl` seconds while
+    the binary still exists.
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path and os.path.exists(_driver_path):
+            return _driver_path
+        try:
+            with open(path, encoding="utf-8") as f:
+                cached = json.load(f)
+            if time.time() - cached["resolved_at"] <= ttl and os.path.exists(cached["path"]):
+                _driver_path = cached["path"]
+                return _driver_path
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        _driver_path = install()
+        try:
+            dirname = os.path.dirname(path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"path": _driver_path, "resolved_at": time.time()}, f)
+        except OSError:
+            pass
+        return _driver_path
+
+
+def _proc_children():
+    """{ ppid: [pid, ...] } read from /proc, for when psutil is not installed."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf-8") as f:
+                stat = f.read()
+            # The command name in parentheses may hold spaces; ppid is the 2nd field after it
+            ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def process_tree_rss_mb(pid):
+    """Resident memory (MB) of `pid` and all its descendants, or None if it cannot be measured."""
+    if pid is None:
+        return None
+    if PSUTIL_AVAILABLE:
+        try:
+            root = psutil.Process(pid)
+            total = 0
+            for proc in [root] + root.children(recursive=True):
+                try:
+                    total += proc.memory_info().rss
+                except psutil.Error:
+                    pass
+        except psutil.Error:
+            return None
+        return total / 1024 / 1024
+    if not os.path.exists(f"/proc/{pid}/statm"):
+        return None
+
+    children = _proc_children()
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/statm", encoding="utf-8") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, ValueError, IndexError):
+            continue
+        pending.extend(children.get(current, ()))
+    return total / 1024 / 1024
+
+
+def session_lost(error):
+    """True if a WebDriver error means the browser session died (rather than e.g. a page timeout)."""
+    text = str(error)
+    return any(sig in text for sig in SESSION_LOST_SIGNATURES)
+
+
+class ManagedDriver:
+    """
+    Stands in for a Selenium driver: attributes it does not define pass through
+    to the current session. Page loads go through get(), which first recycles the
+    browser when it is due and restarts a lost session once before giving up.
+    """
+    def __init__(self, factory, name, max_pages=DEFAULT_MAX_PAGES, max_rss_mb=DEFAULT_MAX_RSS_MB):
+        """
+        factory: () -> new Selenium driver, or None if Chrome could not start.
+        max_pages / max_rss_mb: recycle thresholds; 0 or None disables either.
+        """
+        self.factory = factory
+        self.name = name
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.pages = 0              # page loads over every session
+        self.recycles = 0
+        self.restarts = 0
+        self.peak_rss_mb = None
+        self._session_pages = 0
+        self._retired_commands = 0
+        self._driver = factory()
+
+    def __getattr__(self, name):
+        # Only reached for attributes the wrapper does not have itself
+        driver = self.__dict__.get("_driver")
+        if driver is None:
+            raise AttributeError(f"{self.__dict__.get('name')}: no browser session for '{name}'")
+        return getattr(driver, name)
+
+    @property
+    def alive(self):
+        return self._driver is not None
+
+    @property
+    def command_count(self):
+        """WebDriver round-trips over every session (counted per session by FetchCompanyInfo)."""
+        return self._retired_commands + getattr(self._driver, "command_count", 0)
+
+    def memory_mb(self):
+        """Current RSS of the browser's process tree (also tracked as the peak), or None."""
+        service = getattr(self._driver, "service", None)
+        process = getattr(service, "process", None)
+        rss = process_tree_rss_mb(getattr(process, "pid", None))
+        if rss is not None and (self.peak_rss_mb is None or rss > self.peak_rss_mb):
+            self.peak_rss_mb = rss
+        return rss
+
+    def _recycle_reason(self):
+        if self.max_pages and self._session_pages >= self.max_pages:
+            return f"{self._session_pages} pages"
+        rss = self.memory_mb()
+        if self.max_rss_mb and rss is not None and rss > self.max_rss_mb:
+            return f"{rss:.0f} MB RSS"
+        return None
+
+    def _replace(self):
+        """Quits the current session (if any) and starts a new one."""
+        self._retired_commands = self.command_count
+        self.quit()
+        self._driver = self.factory()
+        self._session_pages = 0
+
+    def get(self, url):
+        if self._driver is not None and self._session_pages:
+            reason = self._recycle_reason()
+            if reason:
+                print(f"{self.name}: recycling the browser after {reason}.")
+                self._replace()
+                self.recycles += 1
+        if self._driver is None:
+            # The session died earlier and could not be restarted then
+            self._replace()
+            self.restarts += 1
+            if self._driver is None:
+                raise RuntimeError(f"{self.name}: could not start a browser session")
+
+        try:
+            self._driver.get(url)
+        except Exception as e:
+            if not session_lost(e):
+                raise
+            print(f"{self.name}: browser session lost ({str(e).strip().splitlines()[0]}), restarting...")
+            self._replace()
+            self.restarts += 1
+            if self._driver is None:
+                raise
+            self._driver.get(url)
+        self.pages += 1
+        self._session_pages += 1
+
+    def quit(self):
+        driver, self._driver = self._driver, None
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+def report_drivers(drivers):
+    """Prints page counts, recycles, restarts and peak memory per managed driver."""
+    managed = [d for d in drivers if isinstance(d, ManagedDriver)]
+    if not managed:
+        return
+    print("Browser drivers (pages, recycles, restarts, peak RSS):")
+    for d in managed:
+        if d.alive:
+            d.memory_mb()
+        peak = f"{d.peak_rss_mb:.0f} MB" if d.peak_rss_mb is not None else "n/a"
+        print(f"  {d.name:<10} {d.pages} pages, {d.recycles} recycles, {d.restarts} restarts, peak {peak}")
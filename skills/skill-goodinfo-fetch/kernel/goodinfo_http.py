@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+goodinfo_http.py
+Description: Plain-HTTP fetcher for GoodInfo StockDetail / StockList pages. GoodInfo answers
+             a new client with a JS "Initializing" challenge; once a Selenium driver has
+             passed it, the driver's cookies and User-Agent are exported into a pooled
+             requests.Session and pages are fetched without the browser. The caller
+             classifies each response; a challenge, block page or error hands the page
+             back to the browser, whose cookies are exported again after its next
+             successful load.
+"""
+
+import threading
+import time
+
+from http_cache import new_session
+
+MAX_CONSECUTIVE_MISSES = 3   # plain HTTP is abandoned for the run after this many misses in a row
+
+
+class GoodInfoHttp:
+    def __init__(self, pool_size=4, enabled=True, timeout=15):
+        """enabled=False makes every fetch go to the browser."""
+        self.enabled = enabled
+        self.timeout = timeout
+        self.session = new_session(pool_size)
+        self.pages = 0          # served over plain HTTP
+        self.seconds = 0.0
+        self.fallbacks = 0      # handed back to the browser
+        self.exports = 0        # cookie exports from a driver
+
+        self._lock = threading.Lock()
+        self._ready = False
+        self._misses = 0
+
+    @property
+    def ready(self):
+        """True once browser cookies are loaded and plain HTTP has not been given up on."""
+        return self.enabled and self._ready
+
+    def adopt_browser_session(self, driver):
+        """Copies `driver`'s cookies and User-Agent into the session. Returns True on success."""
+        if not self.enabled or driver is None:
+            return False
+        try:
+            cookies = driver.get_cookies()
+            user_agent = driver.execute_script("return navigator.userAgent")
+        except Exception:
+            return False
+        if not cookies:
+            return False
+        with self._lock:
+            self.session.cookies.clear()
+            for c in cookies:
+                self.session.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path", "/"))
+            if user_agent:
+                self.session.headers["User-Agent"] = user_agent
+            self._ready = True
+            self.exports += 1
+        return True
+
+    def fetch(self, url):
+        """
+        GETs `url` with the browser's cookies.
+        Returns (status, html, seconds); status and html are None on a network error.
+        The caller reports the page back with accept() or reject().
+        """
+        started = time.monotonic()
+        try:
+            res = self.session.get(url, timeout=self.timeout)
+            if "charset" not in res.headers.get("Content-Type", "").lower():
+                res.encoding = "utf-8"
+            return res.status_code, res.text, time.monotonic() - started
+        except Exception:
+            return None, None, time.monotonic() - started
+
+    def accept(self, seconds):
+        """Counts a page served over plain HTTP."""
+        with self._lock:
+            self.pages += 1
+            self.seconds += seconds
+            self._misses = 0
+
+    def reject(self, outcome):
+        """
+        Hands a page back to the browser: cookies count as stale until the next export,
+        and after MAX_CONSECUTIVE_MISSES in a row plain HTTP is disabled for the run.
+        """
+        with self._lock:
+            self.fallbacks += 1
+            self._misses += 1
+            self._ready = False
+            if self.enabled and self._misses >= MAX_CONSECUTIVE_MISSES:
+                self.enabled = False
+                print(f"GoodInfo over HTTP: {self._misses} misses in a row ({outcome}), "
+                      f"using the browser for the rest of the run.")
+        return outcome
+
+    def report(self):
+        if self.pages or self.fallbacks:
+            mean_ms = self.seconds / self.pages * 1000 if self.pages else 0
+            print(f"GoodInfo over HTTP: {self.pages} pages (mean {mean_ms:.0f} ms), "
+                  f"{self.fallbacks} browser fallbacks, {self.exports} cookie exports from the browser.")
+        self.pages = self.fallbacks = self.exports = self._misses = 0
+        self.seconds = 0.0
+        self._ready = False
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+http_cache.py
+Description: Pooled requests sessions and an on-disk conditional-GET cache for the
+             static downloads (ISIN, MoneyDJ, TAIFEX, watchlist CSVs). Responses carrying
+             an ETag / Last-Modified are revalidated with If-None-Match / If-Modified-Since,
+             so an unchanged page costs a 304; responses with neither are reused until a
+             per-host TTL expires. Streamed requests (stream=True) stay streamed: the
+             body is compressed into the cache chunk by chunk as the caller reads it,
+             and a cached body is inflated chunk by chunk.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_HTTP_CACHE_PATH = os.path.join(".cache", "http_cache.sqlite")
+
+# Seconds a response without ETag / Last-Modified is reused, per host suffix
+DEFAULT_TTLS = {
+    "isin.twse.com.tw": 12 * 3600,
+    "moneydj.com": 6 * 3600,
+    "taifex.com.tw": 6 * 3600,
+}
+DEFAULT_TTL = 0   # unknown hosts: always download unless the server gave a validator
+
+_STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def new_session(pool_size=8):
+    """A requests.Session keeping up to `pool_size` keep-alive connections per host."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class _Inflater:
+    """File-like raw body inflating a zlib blob on read(), for streamed cache hits."""
+    def __init__(self, blob):
+        self._blob = blob
+        self._inflate = zlib.decompressobj()
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data, self._blob = self._inflate.decompress(self._blob) + self._inflate.flush(), b""
+            return data
+        data = self._inflate.decompress(self._inflate.unconsumed_tail or self._blob, size)
+        self._blob = b""
+        if not data and not self._inflate.unconsumed_tail:
+            data = self._inflate.flush()
+        return data
+
+    def close(self):
+        self._blob = b""
+
+    def release_conn(self):
+        pass
+
+
+def _cached_response(url, headers, blob, stream=False):
+    """Response for a cached zlib `blob`; with `stream` the body is only inflated as it is read."""
+    res = requests.Response()
+    res.status_code = 200
+    res.url = url
+    res.headers = CaseInsensitiveDict(headers)
+    if stream:
+        res.raw = _Inflater(blob)
+    else:
+        res._content = zlib.decompress(blob)
+        res._content_consumed = True
+    return res
+
+
+class HttpCache:
+    def __init__(self, path=DEFAULT_HTTP_CACHE_PATH, ttls=None, default_ttl=DEFAULT_TTL, enabled=True):
+        """
+        ttls: { host suffix: seconds } for responses without validators.
+        enabled=False passes every request straight through.
+        The SQLite file is only opened on first use.
+        """
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self.hits = 0           # served without a request
+        self.revalidated = 0    # 304 Not Modified
+        self.misses = 0         # full download
+
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._conn = None
+
+    def _count(self, counter):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _store(self, url, headers, blob):
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO responses (url, fetched_at, headers, body) VALUES (?, ?, ?, ?)",
+                (url, time.time(), json.dumps(headers), blob),
+            )
+            self._db().commit()
+
+    def _tee_stream(self, res, url, headers):
+        """
+        Makes res.iter_content() compress every chunk it yields into the cache, so a
+        streamed body is never held in memory whole. The entry is written once the
+        body has been read to the end; a partly read body is not cached.
+        """
+        iter_content = res.iter_content
+
+        def _iter_content(chunk_size=1, decode_unicode=False):
+            deflate = zlib.compressobj(6)
+            blob = []
+            for chunk in iter_content(chunk_size):
+                blob.append(deflate.compress(chunk))
+                yield chunk
+            blob.append(deflate.flush())
+            self._store(url, headers, b"".join(blob))
+
+        res.iter_content = _iter_content
+
+    def _db(self):
+        if self._conn is None:
+            dirname = os.path.dirname(self.path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    url TEXT PRIMARY KEY,
+                    fetched_at REAL NOT NULL,
+                    headers TEXT NOT NULL,
+                    body BLOB NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _ttl(self, url):
+        host = requests.utils.urlparse(url).hostname or ""
+        for suffix, ttl in self.ttls.items():
+            if host == suffix or host.endswith("." + suffix):
+                return ttl
+        return self.default_ttl
+
+    def get(self, url, fetch, headers=None, **kwargs):
+        """
+        Returns the response for `url`, calling fetch(url, headers=..., **kwargs) only
+        when the cached copy is missing, expired or needs revalidating.
+        With stream=True the response must be read with iter_content().
+        """
+        if not self.enabled:
+            return fetch(url, headers=headers, **kwargs)
+
+        with self._lock:
+            row = self._db().execute(
+                "SELECT fetched_at, headers, body FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+
+        stream = kwargs.get("stream", False)
+        request_headers = dict(headers or {})
+        if row is not None:
+            fetched_at, stored, body = row
+            stored = json.loads(stored)
+            if "ETag" in stored:
+                request_headers["If-None-Match"] = stored["ETag"]
+            if "Last-Modified" in stored:
+                request_headers["If-Modified-Since"] = stored["Last-Modified"]
+            no_validators = "ETag" not in stored and "Last-Modified" not in stored
+            if no_validators and time.time() - fetched_at < self._ttl(url):
+                self._count("hits")
+                return _cached_response(url, stored, body, stream)
+
+        res = fetch(url, headers=request_headers, **kwargs)
+
+        if res.status_code == 304 and row is not None:
+            self._count("revalidated")
+            with self._lock:
+                self._db().execute("UPDATE responses SET fetched_at = ? WHERE url = ?", (time.time(), url))
+                self._db().commit()
+            res.close()
+            return _cached_response(url, stored, body, stream)
+
+        self._count("misses")
+        if res.status_code == 200:
+            stored = {k: res.headers[k] for k in _STORED_HEADERS if k in res.headers}
+            if stream:
+                self._tee_stream(res, url, stored)
+            else:
+                self._store(url, stored, zlib.compress(res.content, 6))
+        return res
+
+    def report(self):
+        lookups = self.hits + self.revalidated + self.misses
+        if not lookups:
+            return
+        ratio = (self.hits + self.revalidated) / lookups
+        print(f"HTTP cache: {self.hits} fresh hits, {self.revalidated} revalidated (304), "
+              f"{self.misses} downloads ({ratio:.0%} served from cache).")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        self.report()
+        self.hits = self.revalidated = self.misses = 0
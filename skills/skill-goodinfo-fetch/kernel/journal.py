@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+journal.py
+Description: Crash-safe checkpoint journal for FetchCompanyInfo.py.
+             Every completed unit of work (per-stock GoodInfo result, group map,
+             LLM batch) is appended as one JSON line and fsync'ed, tagged with the
+             run day. A resumed run on the same day skips whatever the journal
+             already holds; a torn last line from a crash is ignored on load.
+             Resuming prunes the file down to the run day's entries, so a journal
+             kept across days (e.g. in a CI cache) does not grow.
+"""
+
+import json
+import os
+import threading
+import time
+
+DEFAULT_JOURNAL_PATH = os.path.join(".cache", "companyinfo_journal.jsonl")
+
+
+class RunJournal:
+    def __init__(self, path=DEFAULT_JOURNAL_PATH, day=None, resume=False):
+        """
+        day: run day as "YYYY-MM-DD"; entries from other days are ignored.
+        resume=False starts a fresh journal, resume=True keeps today's entries
+        (and drops everything else from the file).
+        """
+        self.path = path
+        self.day = day or time.strftime("%Y-%m-%d", time.gmtime())
+        self._lock = threading.Lock()
+        self.entries = []
+
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        if resume:
+            self.entries = self._load()
+            self._prune()
+            print(f"Journal: resuming with {len(self.entries)} entries from {self.day}.")
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def _load(self):
+        self._dropped = 0
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    self._dropped += 1
+                    continue   # torn write from a crash
+                if entry.get("day") == self.day:
+                    entries.append(entry)
+                else:
+                    self._dropped += 1
+        return entries
+
+    def _prune(self):
+        """Rewrites the file with just the loaded entries (removes it if there are none)."""
+        if not self._dropped:
+            return
+        if not self.entries:
+            os.remove(self.path)
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for entry in self.entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def record(self, kind, **payload):
+        entry = {"kind": kind, "day": self.day, "at": time.time(), **payload}
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries.append(entry)
+
+    # === Views over today's entries ===
+
+    def details(self):
+        """{ 'StockID': (main_biz, concepts, market_cap) } for stocks already scraped today."""
+        return {
+            e["stock_id"]: tuple(e["fields"])
+            for e in self.entries if e["kind"] == "detail"
+        }
+
+    def group_map(self):
+        """(group_map, crawled_at) of today's last group crawl, or None."""
+        for e in reversed(self.entries):
+            if e["kind"] == "group_map":
+                return e["map"], e["crawled_at"]
+        return None
+
+    def llm_batches(self):
+        """(stock IDs already sent to the LLM today, merged results)."""
+        done, results = set(), {}
+        for e in self.entries:
+            if e["kind"] == "llm_batch":
+                done.update(e["stock_ids"])
+                results.update(e["results"])
+        return done, results
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+llm_cache.py
+Description: Persistent cache of LLM concept-stock answers for FetchCompanyInfo.py.
+             An answer is keyed by (stock ID, name, hash of 主要業務, prompt version,
+             model) and reused until its TTL expires, so only new or changed
+             companies are batched to the LLM. "Not related" answers are cached
+             too (as an empty string).
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_LLM_CACHE_PATH = os.path.join(".cache", "llm_concepts.sqlite")
+DEFAULT_LLM_CACHE_TTL = 30 * 86400
+
+
+def text_hash(text):
+    """Short stable hash of a (possibly missing) text field."""
+    if text is None or text != text:   # None / NaN
+        text = ""
+    return hashlib.sha1(str(text).strip().encode("utf-8")).hexdigest()[:16]
+
+
+class LLMConceptCache:
+    def __init__(self, prompt_version, model, path=DEFAULT_LLM_CACHE_PATH,
+                 ttl=DEFAULT_LLM_CACHE_TTL, refresh=False):
+        """
+        prompt_version / model: part of every key, so a new prompt or model misses.
+        refresh=True skips every read but still stores new answers.
+        """
+        self.prompt_version = prompt_version
+        self.model = model
+        self.path = path
+        self.ttl = ttl
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_concepts (
+                stock_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                business_hash TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                model TEXT NOT NULL,
+                concepts TEXT NOT NULL,
+                answered_at REAL NOT NULL,
+                PRIMARY KEY (stock_id, name, business_hash, prompt_version, model)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _key(self, stock_id, name, business):
+        return (str(stock_id), str(name), text_hash(business), self.prompt_version, self.model)
+
+    def get(self, stock_id, name, business):
+        """Returns the cached concepts ("" = not related), or None on a miss."""
+        if self.refresh:
+            self.misses += 1
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT concepts, answered_at FROM llm_concepts WHERE stock_id = ? AND name = ? "
+                "AND business_hash = ? AND prompt_version = ? AND model = ?",
+                self._key(stock_id, name, business),
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, stock_id, name, business, concepts):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_concepts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*self._key(stock_id, name, business), concepts or "", time.time()),
+            )
+            self._conn.commit()
+
+    def invalidate(self, stock_ids=None):
+        """Drops the cached answers of `stock_ids` (every answer if None). Returns the row count."""
+        with self._lock:
+            if stock_ids is None:
+                cur = self._conn.execute("DELETE FROM llm_concepts")
+            else:
+                ids = [str(s) for s in stock_ids]
+                cur = self._conn.execute(
+                    f"DELETE FROM llm_concepts WHERE stock_id IN ({','.join('?' * len(ids))})", ids
+                )
+            self._conn.commit()
+            return cur.rowcount
+
+    def close(self):
+        with self._lock:
+            # Expired answers can never hit again
+            self._conn.execute("DELETE FROM llm_concepts WHERE answered_at < ?", (time.time() - self.ttl,))
+            self._conn.commit()
+            self._conn.close()
+        lookups = self.hits + self.misses
+        if lookups:
+            print(f"LLM cache: {self.hits} hits / {self.misses} misses ({self.hits / lookups:.0%} hit rate).")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+llm_standin.py
+Description: Offline stand-in for llm.LLMClient.generate_smart(), used to exercise the
+             LLM stage of FetchCompanyInfo.py (batching, key rotation, retries, merge)
+             without network access or API quota. Latency, 503 / rate-limit errors
+             and truncated replies are injected at configurable rates; answers come
+             from a canned CSV or are derived deterministically from the stock ID.
+"""
+
+import csv
+import random
+import re
+import threading
+import time
+import zlib
+
+GIANTS = ["TSMC", "Nvidia", "Broadcom", "Oracle", "Google", "Amazon", "Meta", "OpenAI", "Microsoft",
+          "AMD", "Apple", "Micron", "SanDisk", "Qualcomm", "Lenovo", "Dell", "HPQ", "HPE"]
+
+_STOCK_LINE_RE = re.compile(r"^\s*(\d{4,6}[A-Z]?)\s", re.MULTILINE)
+
+
+def load_canned_answers(path):
+    """{ 'StockID': 'Concepts' } from a CSV with StockID, Matched_Concepts columns."""
+    answers = {}
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for row in csv.reader(f):
+            if len(row) >= 2 and row[0].strip().isdigit():
+                answers[row[0].strip()] = row[1].strip()
+    return answers
+
+
+def default_answer(stock_id):
+    """Deterministic answer: about half the stocks relate to one or two giants."""
+    h = zlib.crc32(str(stock_id).encode("utf-8"))
+    if h % 2:
+        return "None"
+    first = GIANTS[(h >> 1) % len(GIANTS)]
+    second = GIANTS[(h >> 8) % len(GIANTS)]
+    return first if (h >> 16) % 3 or first == second else f"{first};{second}"
+
+
+class StandInStats:
+    """Counters shared by every stand-in client of one run."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.overloaded = 0
+        self.rate_limited = 0
+        self.truncated = 0
+        self.stocks_answered = 0
+
+    def add(self, **counts):
+        with self._lock:
+            for name, n in counts.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def retries(self):
+        """Calls that did not answer every stock they were sent."""
+        return self.overloaded + self.rate_limited + self.truncated
+
+
+class StandInLLMClient:
+    def __init__(self, app_name="CompanyInfo", latency=0.2, jitter=0.5, overload_rate=0.0,
+                 rate_limit_rate=0.0, truncate_rate=0.0, answers=None, stats=None, seed=None):
+        """
+        latency: mean seconds per call; jitter: +/- fraction of it.
+        overload_rate / rate_limit_rate: chance a call raises a 503 / 429 error.
+        truncate_rate: chance the reply stops partway through the batch.
+        answers: canned { 'StockID': 'Concepts' }; other stocks get default_answer().
+        """
+        self.app_name = app_name
+        self.latency = latency
+        self.jitter = jitter
+        self.overload_rate = overload_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.truncate_rate = truncate_rate
+        self.answers = answers or {}
+        self.stats = stats or StandInStats()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _roll(self):
+        with self._lock:
+            return self._rng.random(), self._rng.uniform(1 - self.jitter, 1 + self.jitter), self._rng.random()
+
+    def generate_smart(self, task, prompt, **kwargs):
+        error_roll, latency_scale, truncate_roll = self._roll()
+        time.sleep(max(0.0, self.latency * latency_scale))
+        self.stats.add(calls=1)
+
+        if error_roll < self.overload_rate:
+            self.stats.add(overloaded=1)
+            raise RuntimeError("503 UNAVAILABLE: The model is overloaded. Please try again later.")
+        if error_roll < self.overload_rate + self.rate_limit_rate:
+            self.stats.add(rate_limited=1)
+            raise RuntimeError("429 RESOURCE_EXHAUSTED: rate limit exceeded")
+
+        stock_ids = _STOCK_LINE_RE.findall(prompt.split("Stocks:", 1)[-1])
+        if truncate_roll < self.truncate_rate and len(stock_ids) > 1:
+            stock_ids = stock_ids[:len(stock_ids) // 2]
+            self.stats.add(truncated=1)
+        self.stats.add(stocks_answered=len(stock_ids))
+        return "\n".join(f"{sid}, {self.answers.get(sid) or default_answer(sid)}" for sid in stock_ids)
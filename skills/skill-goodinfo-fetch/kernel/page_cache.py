@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+page_cache.py
+Description: On-disk cache of raw GoodInfo page HTML (StockDetail / StockList pages).
+             Each URL is stored zlib-compressed in SQLite together with its fetch time
+             and page type. Entries older than the per-type TTL are treated as misses,
+             and the oldest entries are evicted once the cache exceeds its size bound.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "goodinfo_pages.sqlite")
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+# Seconds a cached page stays fresh, per page type
+DEFAULT_TTLS = {
+    "detail": 12 * 3600,          # StockDetail.asp — 市值 moves daily
+    "group_list": 7 * 86400,      # StockList.asp 集團股 index
+    "group": 7 * 86400,           # StockList.asp single group members
+    "market_cap_list": 12 * 3600, # StockList.asp industry sheet with 市值 (--bulk-market-cap)
+}
+
+
+class PageCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttls=None, max_bytes=DEFAULT_MAX_BYTES, refresh=False):
+        """
+        refresh=True skips every read (forces a reload) but still stores fresh pages.
+        """
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                page_type TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                body BLOB NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_fetched ON pages (fetched_at)")
+        self._conn.commit()
+
+    def get(self, url, page_type, accept=None):
+        """
+        Returns the cached HTML for `url`, or None if missing, expired or refreshing.
+        accept(body) -> False also makes it a miss (e.g. a body from an outdated parser).
+        """
+        if self.refresh:
+            self.misses += 1
+            return None
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fetched_at, body FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+
+        ttl = self.ttls.get(page_type, 0)
+        if row is None or time.time() - row[0] > ttl:
+            self.misses += 1
+            return None
+
+        body = zlib.decompress(row[1]).decode("utf-8")
+        if accept is not None and not accept(body):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return body
+
+    def put(self, url, page_type, html):
+        if not html:
+            return
+        body = zlib.compress(html.encode("utf-8"), 6)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, page_type, fetched_at, size, body) VALUES (?, ?, ?, ?, ?)",
+                (url, page_type, time.time(), len(body), body),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop oldest pages until we are back under 90% of the bound
+        target = self.max_bytes * 0.9
+        for url, size in self._conn.execute(
+            "SELECT url, size FROM pages ORDER BY fetched_at ASC"
+        ).fetchall():
+            if total <= target:
+                break
+            self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            total -= size
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        lookups = self.hits + self.misses
+        ratio = f"{self.hits / lookups:.0%}" if lookups else "n/a"
+        print(f"Page cache: {self.hits} hits / {self.misses} misses ({ratio} hit rate).")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+rate_limiter.py
+Description: Adaptive per-host token-bucket rate limiter shared by every fetch in
+             FetchCompanyInfo.py. Each host starts at a conservative rate, ramps up
+             additively while responses are healthy, and on a timeout / throttle /
+             block signature halves its rate and backs off exponentially with jitter.
+"""
+
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+# host key -> settings. Rates are requests per second.
+DEFAULT_HOST_SETTINGS = {
+    "goodinfo.tw":      {"rate": 1 / 3, "min_rate": 1 / 30, "max_rate": 1.0, "burst": 1, "backoff_base": 5.0},
+    "moneydj.com":      {"rate": 1.0,   "min_rate": 0.1,    "max_rate": 4.0, "burst": 4, "backoff_base": 2.0},
+    "isin.twse.com.tw": {"rate": 1.0,   "min_rate": 0.1,    "max_rate": 4.0, "burst": 4, "backoff_base": 2.0},
+    "taifex.com.tw":    {"rate": 1.0,   "min_rate": 0.1,    "max_rate": 2.0, "burst": 1, "backoff_base": 2.0},
+    "llm":              {"rate": 1 / 3, "min_rate": 1 / 60, "max_rate": 2.0, "burst": 1, "backoff_base": 3.0},
+}
+FALLBACK_SETTINGS = {"rate": 1.0, "min_rate": 0.1, "max_rate": 4.0, "burst": 2, "backoff_base": 2.0}
+MAX_BACKOFF = 60.0
+
+
+class HostLimiter:
+    def __init__(self, host, rate, min_rate, max_rate, burst=1, backoff_base=2.0):
+        self.host = host
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.backoff_base = backoff_base
+
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._backoff_until = 0.0
+        self._failures = 0
+
+        self.requests = 0
+        self.backoffs = 0
+        self._first_request = None
+        self._last_request = None
+
+    def acquire(self, timeout=None):
+        """
+        Blocks until a request to this host is allowed and returns True; returns False
+        instead if that would take longer than `timeout` seconds.
+        """
+        give_up = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._backoff_until:
+                    delay = self._backoff_until - now
+                else:
+                    self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                    self._last = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        self.requests += 1
+                        if self._first_request is None:
+                            self._first_request = now
+                        self._last_request = now
+                        return True
+                    delay = (1 - self._tokens) / self.rate
+            if give_up is not None and time.monotonic() + delay > give_up:
+                return False
+            time.sleep(delay)
+
+    def success(self):
+        """Healthy response: ramp the rate up additively."""
+        with self._lock:
+            self._failures = 0
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def failure(self, reason="error"):
+        """Timeout / throttle / block: halve the rate and back off with jitter."""
+        with self._lock:
+            self._failures += 1
+            self.backoffs += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            backoff = min(MAX_BACKOFF, self.backoff_base * 2 ** (self._failures - 1))
+            backoff *= random.uniform(0.5, 1.5)
+            self._backoff_until = max(self._backoff_until, time.monotonic() + backoff)
+            self._tokens = 0.0
+        print(f"  [{self.host}] {reason}: backing off {backoff:.1f}s, rate now {self.rate:.2f} req/s")
+
+    def effective_rate(self):
+        if self.requests < 2 or self._last_request == self._first_request:
+            return None
+        return (self.requests - 1) / (self._last_request - self._first_request)
+
+
+class RateLimiter:
+    """Registry of HostLimiters keyed by host (or a logical name such as "llm")."""
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULT_HOST_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _key(self, url_or_host):
+        host = urlparse(url_or_host).hostname if "://" in url_or_host else url_or_host
+        host = (host or "").lower()
+        for key in self.settings:
+            if host == key or host.endswith("." + key):
+                return key
+        return host
+
+    def host(self, url_or_host):
+        key = self._key(url_or_host)
+        with self._lock:
+            if key not in self._hosts:
+                self._hosts[key] = HostLimiter(key, **self.settings.get(key, FALLBACK_SETTINGS))
+            return self._hosts[key]
+
+    def configure(self, url_or_host, **overrides):
+        """Adjusts a host's settings (e.g. max_rate from the CLI) before or during a run."""
+        key = self._key(url_or_host)
+        self.settings[key] = {**self.settings.get(key, FALLBACK_SETTINGS), **overrides}
+        limiter = self.host(key)
+        with limiter._lock:
+            for name, value in overrides.items():
+                setattr(limiter, name, value)
+            limiter.rate = min(max(limiter.rate, limiter.min_rate), limiter.max_rate)
+
+    def report(self):
+        if not any(l.requests for l in self._hosts.values()):
+            return
+        print("Rate limiter (effective requests/sec per host):")
+        for key, limiter in sorted(self._hosts.items()):
+            if limiter.requests == 0:
+                continue
+            eff = limiter.effective_rate()
+            eff_text = f"{eff:.2f} req/s" if eff is not None else "n/a"
+            print(f"  {key:<18} {limiter.requests:5d} requests, effective {eff_text}, "
+                  f"final rate {limiter.rate:.2f} req/s, {limiter.backoffs} backoffs")
+
+
+# Shared by every fetch function in the process
+RATE_LIMITER = RateLimiter()
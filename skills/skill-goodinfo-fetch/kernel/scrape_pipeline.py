@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+scrape_pipeline.py
+Description: Staged pipeline for the GoodInfo StockDetail scrape of FetchCompanyInfo.py.
+             Load workers (one thread per driver) only fetch pages and hand what they
+             got to a bounded queue; a small parser pool turns it into fields; a single
+             writer persists them (page cache, journal, results). Page loading never
+             waits on parsing or disk I/O unless a queue is full, which keeps a slow
+             stage from piling up pages in memory. Per-stage throughput, busy time and
+             queue depths are reported at the end of the run.
+"""
+
+import queue
+import threading
+import time
+
+# load() result for an item that was answered but has nothing to keep (e.g. a stock
+# GoodInfo does not list): dropped without counting as a failure
+SKIP_ITEM = object()
+# parse() result asking for the item to be loaded once more (load() is told it is a reload)
+RELOAD = object()
+
+DEFAULT_PARSE_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 16
+_POLL_SECONDS = 0.1
+
+
+class StageStats:
+    """Items, busy time and (for stages fed by a queue) queue depth and stalls of one stage."""
+    def __init__(self, name, workers, capacity=None):
+        self.name = name
+        self.workers = workers
+        self.capacity = capacity     # size of the queue feeding this stage
+        self.items = 0
+        self.busy = 0.0
+        self.depth_max = 0
+        self.stalled = 0.0           # seconds the previous stage waited on a full queue
+        self._depth_sum = 0
+        self._depth_samples = 0
+        self._lock = threading.Lock()
+
+    def done(self, seconds):
+        with self._lock:
+            self.items += 1
+            self.busy += seconds
+
+    def queued(self, depth, stalled):
+        with self._lock:
+            self.depth_max = max(self.depth_max, depth)
+            self._depth_sum += depth
+            self._depth_samples += 1
+            self.stalled += stalled
+
+    def line(self, wall):
+        rate = self.items / wall if wall else 0.0
+        busy = self.busy / (wall * self.workers) if wall and self.workers else 0.0
+        line = f"  {self.name:<6} {self.workers:>2} worker(s), {self.items} pages, {rate:.2f} pages/s, busy {busy:.0%}"
+        if self.capacity:
+            mean = self._depth_sum / self._depth_samples if self._depth_samples else 0.0
+            line += f", queue max {self.depth_max}/{self.capacity} mean {mean:.1f}, upstream stalled {self.stalled:.1f}s"
+        return line
+
+
+class ScrapePipeline:
+    def __init__(self, load, parse, write, parse_workers=DEFAULT_PARSE_WORKERS,
+                 queue_size=DEFAULT_QUEUE_SIZE, breaker=None, deadline=None, describe=None):
+        """
+        load(driver, item, reload) -> raw page, None (failed) or SKIP_ITEM; runs on the driver's thread.
+        parse(item, raw) -> result, None (failed) or RELOAD (honoured once per item).
+        write(item, result): runs on the single writer thread.
+        breaker: CircuitBreaker fed with every load a real driver did; once tripped,
+        items not loaded yet are dropped.
+        deadline: anything with an `expired` property; once it is, items not loaded
+        yet are dropped too (counted in past_deadline).
+        describe(item) -> progress line printed when an item's first load starts.
+        """
+        self.load = load
+        self.parse = parse
+        self.write = write
+        self.parse_workers = max(1, parse_workers)
+        self.queue_size = queue_size
+        self.breaker = breaker
+        self.deadline = deadline
+        self.describe = describe
+        self.stats = []
+        self.wall = 0.0
+        self.past_deadline = 0
+
+    def _tripped(self):
+        return self.breaker is not None and self.breaker.tripped
+
+    def run(self, drivers, items):
+        """Pushes every item through load -> parse -> write; returns once each is written or dropped."""
+        jobs = queue.Queue()
+        for pos, item in enumerate(items):
+            jobs.put((pos, item, False))
+        to_parse = queue.Queue(maxsize=self.queue_size)
+        to_write = queue.Queue(maxsize=self.queue_size)
+        load_stats = StageStats("load", len(drivers))
+        parse_stats = StageStats("parse", self.parse_workers, self.queue_size)
+        write_stats = StageStats("write", 1, self.queue_size)
+        self.stats = [load_stats, parse_stats, write_stats]
+        self.past_deadline = 0
+
+        total = len(items)
+        pending = [total]
+        pending_lock = threading.Lock()
+        finished = threading.Event()
+        if not total:
+            finished.set()
+
+        def _drop():
+            with pending_lock:
+                pending[0] -= 1
+                if pending[0] == 0:
+                    finished.set()
+
+        def _hand_on(q, stats, entry):
+            depth = q.qsize()
+            started = time.monotonic()
+            q.put(entry)
+            stats.queued(depth, time.monotonic() - started)
+
+        def _next(q):
+            """Next entry of `q`, or None once every item is done."""
+            while True:
+                try:
+                    return q.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    if finished.is_set():
+                        return None
+
+        def _loader(driver):
+            while True:
+                entry = _next(jobs)
+                if entry is None:
+                    return
+                pos, item, reload = entry
+                if self._tripped():
+                    _drop()
+                    continue
+                if self.deadline is not None and self.deadline.expired:
+                    with pending_lock:
+                        self.past_deadline += 1
+                    _drop()
+                    continue
+                if self.describe is not None and not reload:
+                    print(f"[{pos + 1}/{total}] {self.describe(item)}")
+                started = time.monotonic()
+                try:
+                    raw = self.load(driver, item, reload)
+                except Exception as e:
+                    print(f"  Skipping {item} due to error: {e}")
+                    raw = None
+                load_stats.done(time.monotonic() - started)
+                if driver is not None and self.breaker is not None:
+                    self.breaker.record(raw is not None)
+                if raw is None or raw is SKIP_ITEM:
+                    _drop()
+                else:
+                    _hand_on(to_parse, parse_stats, (item, raw, reload))
+
+        def _parser():
+            while True:
+                entry = _next(to_parse)
+                if entry is None:
+                    return
+                item, raw, reload = entry
+                started = time.monotonic()
+                try:
+                    result = self.parse(item, raw)
+                except Exception as e:
+                    print(f"  Skipping {item}: could not parse page: {e}")
+                    result = None
+                parse_stats.done(time.monotonic() - started)
+                if result is RELOAD and not reload:
+                    jobs.put((None, item, True))
+                elif result is None or result is RELOAD:
+                    _drop()
+                else:
+                    _hand_on(to_write, write_stats, (item, result))
+
+        def _writer():
+            while True:
+                entry = _next(to_write)
+                if entry is None:
+                    return
+                item, result = entry
+                started = time.monotonic()
+                try:
+                    self.write(item, result)
+                except Exception as e:
+                    print(f"  Could not store {item}: {e}")
+                write_stats.done(time.monotonic() - started)
+                _drop()
+
+        run_started = time.monotonic()
+        threads = [threading.Thread(target=_loader, args=(d,), daemon=True) for d in drivers]
+        threads += [threading.Thread(target=_parser, daemon=True) for _ in range(self.parse_workers)]
+        threads.append(threading.Thread(target=_writer, daemon=True))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.wall = time.monotonic() - run_started
+
+    def report(self):
+        if not self.stats or not self.stats[0].items:
+            return
+        print(f"Scrape pipeline ({self.wall:.1f}s wall, load -> parse -> write):")
+        for stats in self.stats:
+            print(stats.line(self.wall))
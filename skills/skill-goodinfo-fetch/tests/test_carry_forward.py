@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_carry_forward.py
+Description: Carrying values forward from the previous raw_companyinfo.csv
+             (--incremental / --deadline) and writing fresh scrapes over them.
+"""
+
+import io
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "kernel"))
+
+import FetchCompanyInfo as F  # noqa: E402
+
+RUN_STAMP = "2026-10-17 08:00:00"
+
+
+def _merged(stock_ids):
+    merged = pd.DataFrame({"代號": stock_ids}, index=pd.Index(stock_ids, name="代號"))
+    for col in ["主要業務", "相關概念", "相關集團", "市值", *F.FRESHNESS_COLUMNS]:
+        merged[col] = None
+    return merged
+
+
+def _previous_output(csv_text):
+    prev = pd.read_csv(io.StringIO(csv_text), dtype={"代號": str})
+    return prev.set_index("代號")
+
+
+def test_all_empty_column_accepts_scraped_detail():
+    # Columns with no values at all read back from the CSV as float64
+    prev = _previous_output(
+        "代號,主要業務,相關集團,主要業務_timestamp,相關概念_timestamp,市值_timestamp\n"
+        "2330,,,,,\n"
+        "2317,,,,,\n"
+    )
+    assert prev["主要業務"].dtype == "float64"
+
+    merged = _merged(["2330", "2317"])
+    F.carry_forward_columns(merged, prev, ["主要業務", "相關集團", *F.FRESHNESS_COLUMNS])
+    refreshed = F.apply_detail_results(merged, {"2330": ("晶圓代工", "AI", "1億")}, RUN_STAMP)
+
+    assert refreshed == {"2330"}
+    assert merged.loc["2330", "主要業務"] == "晶圓代工"
+    assert merged.loc["2330", "相關概念"] == "AI"
+    assert merged.loc["2330", "市值"] == "1億"
+    assert merged.loc["2330", "主要業務_timestamp"] == RUN_STAMP
+    assert pd.isna(merged.loc["2317", "主要業務"])
+    assert pd.isna(merged.loc["2317", "主要業務_timestamp"])
+
+
+def test_carried_values_survive_for_stocks_not_scraped():
+    prev = _previous_output(
+        "代號,主要業務,主要業務_timestamp\n"
+        "2330,舊業務,2026-10-01 08:00:00\n"
+        "2317,鴻海業務,2026-10-01 08:00:00\n"
+    )
+    merged = _merged(["2330", "2317", "1101"])
+    F.carry_forward_columns(merged, prev, ["主要業務", "相關集團", *F.FRESHNESS_COLUMNS])
+    F.apply_detail_results(merged, {"2330": ("新業務", None, None)}, RUN_STAMP)
+
+    assert merged.loc["2330", "主要業務"] == "新業務"
+    assert merged.loc["2317", "主要業務"] == "鴻海業務"
+    assert merged.loc["2317", "主要業務_timestamp"] == "2026-10-01 08:00:00"
+    assert pd.isna(merged.loc["1101", "主要業務"])
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_deadline.py
+Description: --deadline budgets: scrape and output reserves stay inside short budgets.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "kernel"))
+
+import FetchCompanyInfo as F  # noqa: E402
+
+
+def test_small_budget_leaves_time_for_every_stage():
+    scrape, final = F.run_deadlines(20, F.DEADLINE_RESERVE, started=0.0)
+
+    assert scrape.reserve == 20 * F.DEADLINE_RESERVE_MAX_SHARE
+    assert final.reserve == 20 * F.DEADLINE_OUTPUT_MAX_SHARE
+    assert final.reserve < scrape.reserve < 20
+
+
+def test_small_budget_has_not_expired_at_start():
+    scrape, final = F.run_deadlines(20, F.DEADLINE_RESERVE)
+
+    assert not scrape.expired
+    assert not final.expired
+    assert 0 < scrape.remaining() < final.remaining() <= 20
+
+
+def test_long_budget_keeps_configured_reserves():
+    scrape, final = F.run_deadlines(60 * 60, F.DEADLINE_RESERVE, started=0.0)
+
+    assert scrape.reserve == F.DEADLINE_RESERVE
+    assert final.reserve == F.DEADLINE_OUTPUT_MARGIN
+
+
+def test_no_budget_never_expires():
+    scrape, final = F.run_deadlines(None, F.DEADLINE_RESERVE)
+
+    assert not scrape.expired and not final.expired
+    assert scrape.remaining() == float("inf")
+
+
+def test_parse_args_caps_reserve():
+    args = F.parse_args(["--deadline", "2"])
+
+    assert args.deadline_reserve == 2 * F.DEADLINE_RESERVE_MAX_SHARE
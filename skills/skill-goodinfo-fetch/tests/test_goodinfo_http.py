@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_goodinfo_http.py
+Description: Pages fetched over plain HTTP and parsed later (parse=False) are counted
+             once, after the parse stage has classified them.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "kernel"))
+
+import FetchCompanyInfo as F  # noqa: E402
+import goodinfo_http  # noqa: E402
+
+DETAIL_PAGE = ('<html><body><table><tr><td><nobr>主要業務</nobr></td><td><p>晶圓代工</p></td></tr>'
+               '<tr><td>市值</td><td>1億</td></tr></table></body></html>')
+BLOCK_PAGE = "<html><body><table><tr><td>瀏覽量異常</td></tr></table></body></html>"
+
+
+def _http(monkeypatch, html):
+    http = goodinfo_http.GoodInfoHttp()
+    monkeypatch.setattr(http, "fetch", lambda url: (200, html, 0.25))
+    monkeypatch.setattr(F, "GOODINFO_HTTP", http)
+    F.RATE_LIMITER.configure("goodinfo.tw", rate=1000.0, max_rate=1000.0, backoff_base=0.0)
+    return http
+
+
+def _load_and_parse(http, stock_id="2330"):
+    http._ready = True   # cookies just exported from the browser
+    counts = (http.pages, http.fallbacks)
+    url = F.GOODINFO_DETAIL_URL.format(stock_id=stock_id)
+    outcome, page = F._fetch_goodinfo_http(url, "detail", parse=False)
+    assert outcome is None
+    assert (http.pages, http.fallbacks) == counts   # the load stage counts nothing
+    return F.finish_goodinfo_page("detail", page)
+
+
+def test_parsed_page_counts_as_served_once(monkeypatch):
+    http = _http(monkeypatch, DETAIL_PAGE)
+
+    assert _load_and_parse(http) == F.PAGE_OK
+    assert (http.pages, http.fallbacks) == (1, 0)
+
+
+def test_block_pages_found_while_parsing_disable_http(monkeypatch):
+    http = _http(monkeypatch, BLOCK_PAGE)
+
+    for n in range(goodinfo_http.MAX_CONSECUTIVE_MISSES):
+        assert _load_and_parse(http, str(2330 + n)) == F.PAGE_BLOCKED
+
+    assert (http.pages, http.fallbacks) == (0, goodinfo_http.MAX_CONSECUTIVE_MISSES)
+    assert not http.enabled
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_journal.py
+Description: RunJournal resume: today's entries are kept, everything else is pruned.
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "kernel"))
+
+from journal import RunJournal  # noqa: E402
+
+
+def _write_lines(path, days, torn=False):
+    with open(path, "w", encoding="utf-8") as f:
+        for n, day in enumerate(days):
+            f.write(json.dumps({"kind": "detail", "day": day, "at": 0, "stock_id": str(n), "fields": [n, None, None]}) + "\n")
+        if torn:
+            f.write('{"kind": "det')
+
+
+def test_resume_prunes_other_days(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    _write_lines(path, ["2026-10-15", "2026-10-17", "2026-10-16", "2026-10-17"], torn=True)
+
+    journal = RunJournal(path, day="2026-10-17", resume=True)
+
+    assert journal.details() == {"1": (1, None, None), "3": (3, None, None)}
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["day"] for line in f] == ["2026-10-17", "2026-10-17"]
+
+
+def test_resume_without_todays_entries_starts_fresh(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    _write_lines(path, ["2026-10-15", "2026-10-16"])
+
+    journal = RunJournal(path, day="2026-10-17", resume=True)
+    assert journal.details() == {}
+    assert not os.path.exists(path)
+
+    journal.record("detail", stock_id="2330", fields=["業務", None, "1億"])
+    assert RunJournal(path, day="2026-10-17", resume=True).details() == {"2330": ("業務", None, "1億")}